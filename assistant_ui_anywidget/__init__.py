@@ -1,15 +1,23 @@
 """Assistant UI AnyWidget package."""
 
-from .agent_widget import AgentWidget
+import importlib
+from typing import TYPE_CHECKING, Any
 
-# Global agent interface for notebook convenience
-from .global_agent import (
-    get_agent,
-    reset_agent,
-)
 from .kernel_interface import ExecutionResult, KernelInterface, StackFrame, VariableInfo
 from .simple_handlers import SimpleHandlers
 
+if TYPE_CHECKING:
+    from .agent_widget import AgentWidget
+    from .global_agent import get_agent, reset_agent
+
+# The widget pulls in anywidget and the LangGraph stack, so it is only
+# imported on first access (PEP 562)
+_LAZY_IMPORTS = {
+    "AgentWidget": ".agent_widget",
+    "get_agent": ".global_agent",
+    "reset_agent": ".global_agent",
+}
+
 __all__ = [
     # Core widget classes
     "AgentWidget",
@@ -23,3 +31,15 @@ __all__ = [
     "get_agent",
     "reset_agent",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value  # Cache so __getattr__ is not hit again
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
@@ -1,20 +1,61 @@
 """AgentWidget with AI and kernel access capabilities."""
 
+import asyncio
+import collections
+import heapq
+import itertools
 import pathlib
-from typing import Any, Dict, List, Optional
+import time
+import uuid
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 import anywidget
 import traitlets
 
-from .ai import LangGraphAIService
-from .kernel_interface import AIConfig, ExecutionResult, KernelContext, KernelInterface
+from .ai import ChatResult, LangGraphAIService
+from .kernel_interface import (
+    AIConfig,
+    ExecutionResult,
+    KernelContext,
+    KernelInterface,
+    VariableInfo,
+)
 from .simple_handlers import SimpleHandlers
 
+if TYPE_CHECKING:
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+
+
+# Number of executed code entries kept in ``code_history``
+MAX_CODE_HISTORY = 50
+
+# Number of VariableInfo entries reused between kernel views and AI context
+MAX_VARIABLE_INFO_CACHE = 200
+
+
+def _get_running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """Return the running event loop (e.g. the kernel's), or None outside one."""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
 
 class AgentWidget(anywidget.AnyWidget):
     """AI-powered assistant widget with kernel access."""
 
-    # Path to the compiled JavaScript bundle
+    # Path to the compiled JavaScript bundle. anywidget reads it once when the
+    # class is defined (and watches it for hot reload), not per instance.
     _esm = pathlib.Path(__file__).parent / "static" / "index.js"
 
     # Basic widget state synchronized between Python and JavaScript
@@ -44,6 +85,15 @@ class AgentWidget(anywidget.AnyWidget):
         }
     ).tag(sync=True)
 
+    # Slash commands, called with the widget and the text after the command
+    _COMMANDS: Dict[str, Callable[["AgentWidget", str], str]] = {
+        "/vars": lambda self, args: self._cmd_show_variables(),
+        "/inspect": lambda self, args: self._cmd_inspect_variable(args),
+        "/exec": lambda self, args: self._cmd_execute_code(args),
+        "/clear": lambda self, args: self._cmd_clear_namespace(),
+        "/help": lambda self, args: self._cmd_show_help(),
+    }
+
     def __init__(
         self,
         model: Optional[str] = None,
@@ -54,9 +104,14 @@ class AgentWidget(anywidget.AnyWidget):
         require_approval: bool = False,
         show_help: bool = True,
         enable_ai: bool = True,
+        checkpointer: Optional["BaseCheckpointSaver"] = None,
         **kwargs: Any,
     ) -> None:
-        """Initialize the widget."""
+        """Initialize the widget.
+
+        ``checkpointer`` is passed to the AI service to store the conversation,
+        e.g. a ``SqliteSaver`` to keep long histories on disk instead of in memory.
+        """
         super().__init__(**kwargs)
 
         # Initialize kernel interface and message handlers
@@ -69,6 +124,29 @@ class AgentWidget(anywidget.AnyWidget):
         # Initialize thread ID
         self._thread_id: Optional[str] = None
 
+        # Thread of the last AI response that is waiting for approval
+        self._pending_approval_thread_id: Optional[str] = None
+
+        # Kernel context for the AI, keyed on the kernel state version it was built at
+        self._context_cache: Optional[Tuple[Any, KernelContext]] = None
+
+        # Kernel state version the kernel views were last built at
+        self._views_version: Optional[Tuple[int, int]] = None
+
+        # VariableInfo shared by the variables view and the AI context
+        self._var_info_cache: collections.OrderedDict[
+            Tuple[str, Any], Optional[VariableInfo]
+        ] = collections.OrderedDict()
+
+        # Keep references to in-flight AI tasks so they are not garbage collected
+        self._tasks: Set["asyncio.Task[None]"] = set()
+
+        # AI turns share one conversation thread, so they run one at a time
+        self._ai_lock = asyncio.Lock()
+
+        # Messages and approvals that are still waiting for a response
+        self._pending_turns = 0
+
         # Initialize AI service
         self.ai_service: Optional[LangGraphAIService] = None
 
@@ -91,6 +169,7 @@ class AgentWidget(anywidget.AnyWidget):
                 model=model,
                 provider=provider,
                 require_approval=require_approval,
+                checkpointer=checkpointer,
             )
         else:
             # No AI service for testing or kernel-only mode
@@ -100,8 +179,7 @@ class AgentWidget(anywidget.AnyWidget):
         self.on_msg(self._handle_message)
 
         # Initialize kernel state
-        self._update_kernel_state()
-        self._update_variables_info()
+        self._refresh_kernel_views()
         if show_help:
             self.add_message(
                 "assistant",
@@ -124,7 +202,11 @@ class AgentWidget(anywidget.AnyWidget):
         if msg_type == "user_message":
             # Handle regular chat messages
             user_text = content.get("text", "")
-            self._handle_user_message(user_text)
+            if _get_running_loop() is None:
+                self._handle_user_message(user_text)
+            else:
+                # Inside the kernel: don't block its event loop on the LLM call
+                self._schedule(self._handle_user_message_async(user_text))
 
         elif msg_type == "api_request":
             # Handle API requests (kernel interactions)
@@ -136,93 +218,136 @@ class AgentWidget(anywidget.AnyWidget):
 
             # Update state if needed
             if request.get("type") == "execute_code":
-                self._update_kernel_state()
-                self._update_variables_info()
+                self._refresh_kernel_views()
 
         elif msg_type == "action_button":
             # Handle action button clicks
             action = content.get("action", "")
             self._handle_action_button(action)
 
+    def _schedule(self, coro: Coroutine[Any, Any, None]) -> None:
+        """Run a coroutine on the kernel's event loop in the background."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
     def _handle_user_message(self, user_text: str) -> None:
         """Handle user chat messages."""
-        # Add user message to history
-        new_history = list(self.chat_history)
-        new_history.append({"role": "user", "content": user_text})
+        if not self._start_user_message(user_text) or not self.ai_service:
+            return
 
-        # Update chat history immediately so user message appears in UI
-        self.chat_history = new_history
+        result = self.ai_service.chat(
+            message=user_text,
+            thread_id=self._get_thread_id(),
+            context=self._get_kernel_context(),
+        )
+        self._finish_user_message(result)
+
+    async def _handle_user_message_async(self, user_text: str) -> None:
+        """Handle user chat messages without blocking the kernel's event loop."""
+        if not self._start_user_message(user_text) or not self.ai_service:
+            return
+
+        async with self._ai_lock:
+            result = await self._achat_streaming(user_text, self._get_thread_id())
+            self._finish_user_message(result)
+
+    async def _achat_streaming(self, message: str | bool, thread_id: str) -> ChatResult:
+        """Ask the AI service, streaming the response text to the frontend.
+
+        The frontend shows the streamed text until the final message is appended
+        to ``chat_history``, so only complete messages are stored.
+        """
+        assert self.ai_service is not None
+        stream_id = str(uuid.uuid4())
+        self.send({"type": "chat_stream_start", "id": stream_id})
+        try:
+            return await self.ai_service.achat(
+                message=message,
+                thread_id=thread_id,
+                context=self._get_kernel_context(),
+                on_token=lambda delta: self.send(
+                    {"type": "chat_stream_delta", "id": stream_id, "delta": delta}
+                ),
+            )
+        finally:
+            self.send({"type": "chat_stream_end", "id": stream_id})
+
+    def _start_user_message(self, user_text: str) -> bool:
+        """Record a user message and answer it locally if possible.
+
+        Returns True if the message still needs a response from the AI service.
+        """
+        # Add user message immediately so it appears in the UI
+        self._append_chat({"role": "user", "content": user_text})
 
         # Only generate responses if AI service is available
-        if self.ai_service:
-            # Set loading state
-            self.is_loading = True
-            # Check if this is a command or regular message
-            if user_text.startswith("/"):
-                # Handle commands
-                response = self._handle_command(user_text)
-                self.add_message("assistant", response)
-                self.is_loading = False
-            else:
-                # Get kernel context for AI
-                context = self._get_kernel_context()
-
-                # Get AI response
-                result = self.ai_service.chat(
-                    message=user_text,
-                    thread_id=self._get_thread_id(),
-                    context=context,
+        if not self.ai_service:
+            return False
+
+        # Set loading state
+        self._start_loading()
+        # Check if this is a command or regular message
+        if user_text.startswith("/"):
+            # Handle commands
+            response = self._handle_command(user_text)
+            self.add_message("assistant", response)
+            self._stop_loading()
+            return False
+        return True
+
+    def _start_loading(self) -> None:
+        """Show the loading state until a response arrives."""
+        self._pending_turns += 1
+        self.is_loading = True
+
+    def _stop_loading(self) -> None:
+        """Clear the loading state once no other response is pending."""
+        self._pending_turns -= 1
+        self.is_loading = self._pending_turns > 0
+
+    def _finish_user_message(self, result: ChatResult) -> None:
+        """Show the AI response or the approval request for a user message."""
+        # Send the buttons and loading state to the frontend in one comm message
+        with self.hold_sync():
+            # Handle approval requests
+            if result.needs_approval:
+                # Show approval request
+                interrupt_msg = getattr(
+                    result, "interrupt_message", "Approval required"
+                )
+                # Add message with metadata for approval tracking
+                self._append_chat(
+                    {
+                        "role": "assistant",
+                        "content": f"🔐 **Approval Required**\n\n{interrupt_msg}",
+                        "needs_approval": True,
+                        "thread_id": result.thread_id,
+                    }
+                )
+                self._pending_approval_thread_id = result.thread_id
+
+                # Set action buttons for approval
+                self.set_action_buttons(
+                    [
+                        {"text": "Approve", "color": "#28a745", "icon": "✅"},
+                        {"text": "Deny", "color": "#dc3545", "icon": "❌"},
+                    ]
                 )
+            else:
+                self.add_message("assistant", result.content)
 
-                # Handle approval requests
-                if result.needs_approval:
-                    # Show approval request
-                    interrupt_msg = getattr(
-                        result, "interrupt_message", "Approval required"
-                    )
-                    # Add message with metadata for approval tracking
-                    current_history = list(self.chat_history)
-                    current_history.append(
-                        {
-                            "role": "assistant",
-                            "content": f"🔐 **Approval Required**\n\n{interrupt_msg}",
-                            "needs_approval": True,
-                            "thread_id": result.thread_id,
-                        }
-                    )
-                    self.chat_history = current_history
-
-                    # Set action buttons for approval
-                    self.set_action_buttons(
-                        [
-                            {"text": "Approve", "color": "#28a745", "icon": "✅"},
-                            {"text": "Deny", "color": "#dc3545", "icon": "❌"},
-                        ]
-                    )
-                else:
-                    self.add_message("assistant", result.content)
-
-                # Clear loading state
-                self.is_loading = False
+            # Clear loading state
+            self._stop_loading()
 
     def _handle_command(self, command: str) -> str:
         """Handle slash commands."""
         parts = command.split(maxsplit=1)
         cmd = parts[0].lower()
-        args = parts[1] if len(parts) > 1 else ""
-
-        if cmd == "/vars":
-            return self._cmd_show_variables()
-        elif cmd == "/inspect":
-            return self._cmd_inspect_variable(args)
-        elif cmd == "/exec":
-            return self._cmd_execute_code(args)
-        elif cmd == "/clear":
-            return self._cmd_clear_namespace()
-        elif cmd == "/help":
-            return self._cmd_show_help()
-        else:
+        handler = self._COMMANDS.get(cmd)
+        if handler is None:
             return f"Unknown command: {cmd}. Type /help for available commands."
+        return handler(self, parts[1] if len(parts) > 1 else "")
 
     def _cmd_show_variables(self) -> str:
         """Show all variables in the namespace."""
@@ -230,12 +355,10 @@ class AgentWidget(anywidget.AnyWidget):
         if not namespace:
             return "No variables in namespace."
 
-        lines = ["**Variables in namespace:**\n"]
-        for name, value in sorted(namespace.items()):
-            type_name = type(value).__name__
-            lines.append(f"- `{name}`: {type_name}")
-
-        return "\n".join(lines)
+        return "**Variables in namespace:**\n\n" + "\n".join(
+            f"- `{name}`: {type(value).__name__}"
+            for name, value in sorted(namespace.items())
+        )
 
     def _cmd_inspect_variable(self, var_name: str) -> str:
         """Inspect a specific variable."""
@@ -309,8 +432,7 @@ class AgentWidget(anywidget.AnyWidget):
         )
 
         # Update state after execution
-        self._update_kernel_state()
-        self._update_variables_info()
+        self._refresh_kernel_views()
 
         return "\n".join(lines)
 
@@ -350,7 +472,11 @@ class AgentWidget(anywidget.AnyWidget):
             # Clear buttons immediately when approval action is clicked
             self.clear_action_buttons()
             # Handle LangGraph approval
-            self._handle_approval(action == "Approve")
+            approved = action == "Approve"
+            if _get_running_loop() is None:
+                self._handle_approval(approved)
+            else:
+                self._schedule(self._handle_approval_async(approved))
         elif action == "Confirm Clear":
             # Clear namespace
             code = """
@@ -376,9 +502,9 @@ for var in list(globals().keys()):
             else:
                 self.add_message("system", "❌ Failed to clear namespace.")
 
-            self.clear_action_buttons()
-            self._update_kernel_state()
-            self._update_variables_info()
+            with self.hold_sync():
+                self.clear_action_buttons()
+                self._refresh_kernel_views()
 
         elif action == "Cancel":
             self.add_message("system", "Cancelled namespace clearing.")
@@ -386,94 +512,133 @@ for var in list(globals().keys()):
 
     def _handle_approval(self, approved: bool) -> None:
         """Handle approval/denial of code execution."""
-        # Set loading state
-        self.is_loading = True
+        thread_id = self._start_approval()
+        if not thread_id or not self.ai_service:
+            return
 
-        # Find the last approval request in history
-        thread_id = None
-        for msg in reversed(self.chat_history):
-            if isinstance(msg, dict) and msg.get("needs_approval"):
-                thread_id = msg.get("thread_id")
-                break
+        # Send approval decision to LangGraph
+        ai_result = self.ai_service.chat(
+            message=approved,  # Send boolean for approval
+            thread_id=thread_id,
+            context=self._get_kernel_context(),
+        )
+        self._finish_approval(approved, ai_result)
 
+    async def _handle_approval_async(self, approved: bool) -> None:
+        """Handle approval/denial without blocking the kernel's event loop."""
+        thread_id = self._start_approval()
         if not thread_id or not self.ai_service:
-            self.add_message("system", "❌ No pending approval request found.")
-            self.clear_action_buttons()
-            self.is_loading = False
             return
 
-        # Send approval decision to LangGraph
-        if self.ai_service:
-            ai_result = self.ai_service.chat(
-                message=approved,  # Send boolean for approval
-                thread_id=thread_id,
-                context=self._get_kernel_context(),
-            )
+        async with self._ai_lock:
+            ai_result = await self._achat_streaming(approved, thread_id)
+            self._finish_approval(approved, ai_result)
 
-            # Add response to history
-            if ai_result.content:
-                self.add_message("assistant", ai_result.content)
-            elif approved:
-                self.add_message("system", "✅ Code execution approved.")
-            else:
-                self.add_message("system", "❌ Code execution denied.")
+    def _start_approval(self) -> Optional[str]:
+        """Find the thread awaiting approval, or report that there is none."""
+        # Set loading state
+        self._start_loading()
+
+        # Take the pending approval request, so it is only answered once
+        thread_id = self._pending_approval_thread_id
+        self._pending_approval_thread_id = None
+
+        if not thread_id or not self.ai_service:
+            self.add_message("system", "❌ No pending approval request found.")
+            with self.hold_sync():
+                self.clear_action_buttons()
+                self._stop_loading()
+            return None
+        return thread_id
+
+    def _finish_approval(self, approved: bool, ai_result: ChatResult) -> None:
+        """Show the outcome of an approval decision."""
+        # Add response to history
+        if ai_result.content:
+            self.add_message("assistant", ai_result.content)
+        elif approved:
+            self.add_message("system", "✅ Code execution approved.")
+        else:
+            self.add_message("system", "❌ Code execution denied.")
 
-        # Clear action buttons
-        self.clear_action_buttons()
+        # Send buttons, loading state and kernel views in one comm message
+        with self.hold_sync():
+            # Clear action buttons
+            self.clear_action_buttons()
 
-        # Clear loading state
-        self.is_loading = False
+            # Clear loading state
+            self._stop_loading()
 
-        # Update state after potential code execution
-        if approved:
-            self._update_kernel_state()
-            self._update_variables_info()
+            # Update state after potential code execution
+            if approved:
+                self._refresh_kernel_views()
 
-    def _update_kernel_state(self) -> None:
-        """Update kernel state information."""
+    def _refresh_kernel_views(self) -> None:
+        """Update kernel state and variables info from a single namespace walk."""
         if not self.kernel.is_available:
-            self.kernel_state = {"available": False, "status": "not_connected"}
+            self._views_version = None
+            with self.hold_sync():
+                self.kernel_state = {"available": False, "status": "not_connected"}
+                self.variables_info = []
+            return
+
+        # Nothing to refresh if no code ran, not even silently, so skip the
+        # namespace walk and the comm sync
+        version = self.kernel.state_version
+        if version == self._views_version:
             return
+        self._views_version = version
 
         info = self.kernel.get_kernel_info()
         namespace = self.kernel.get_namespace()
 
         # Count variables by type
-        by_type: Dict[str, int] = {}
-        for name, value in namespace.items():
-            type_name = type(value).__name__
-            by_type[type_name] = by_type.get(type_name, 0) + 1
-
-        self.kernel_state = {
-            "available": True,
-            "status": "idle",
-            "execution_count": info.get("execution_count", 0),
-            "namespace_size": len(namespace),
-            "variables_by_type": by_type,
-        }
-
-    def _update_variables_info(self) -> None:
-        """Update variables information."""
-        if not self.kernel.is_available:
-            self.variables_info = []
-            return
+        by_type = dict(
+            collections.Counter(type(value).__name__ for value in namespace.values())
+        )
 
-        namespace = self.kernel.get_namespace()
+        # Collect details for the first 50 names without sorting them all
         var_infos = []
-
-        for name in sorted(namespace.keys())[:50]:  # Limit to prevent overwhelming
-            var_info = self.kernel.get_variable_info(name)
+        for name in heapq.nsmallest(50, namespace):  # Limit to prevent overwhelming
+            var_info = self._get_variable_info(name)
             if var_info:
                 var_infos.append(var_info.to_dict())
 
-        self.variables_info = var_infos
+        # Send both traitlets to the frontend in one comm message
+        with self.hold_sync():
+            self.kernel_state = {
+                "available": True,
+                "status": "idle",
+                "execution_count": info.get("execution_count", 0),
+                "namespace_size": len(namespace),
+                "variables_by_type": by_type,
+            }
+            self.variables_info = var_infos
+
+    def _get_variable_info(self, name: str) -> Optional[VariableInfo]:
+        """Get variable info, reusing it until code runs in the kernel."""
+        key = (name, self.kernel.state_version)
+        if key in self._var_info_cache:
+            return self._var_info_cache[key]
+        var_info = self.kernel.get_variable_info(name)
+        self._var_info_cache[key] = var_info
+        if len(self._var_info_cache) > MAX_VARIABLE_INFO_CACHE:
+            self._var_info_cache.popitem(last=False)
+        return var_info
 
     # Public API methods
     def add_message(self, role: str, content: str) -> None:
         """Add a message to the chat history from Python."""
-        new_history = list(self.chat_history)
-        new_history.append({"role": role, "content": content})
-        self.chat_history = new_history
+        self._append_chat({"role": role, "content": content})
+
+    def _append_chat(self, message: Dict[str, Any]) -> None:
+        """Append a chat message, sending only the new message to the frontend.
+
+        The synced list is mutated in place so traitlets doesn't re-serialize
+        the whole history; frontends that attach later still get it in full.
+        """
+        self.chat_history.append(message)
+        self.send({"type": "chat_append", "message": message})
 
     def get_chat_history(self) -> List[Dict[str, str]]:
         """Get the current chat history."""
@@ -482,6 +647,7 @@ for var in list(globals().keys()):
     def clear_chat_history(self) -> None:
         """Clear the chat history."""
         self.chat_history = []
+        self._pending_approval_thread_id = None
 
     def set_action_buttons(self, buttons: List[str | Dict[str, str]]) -> None:
         """Set action buttons to display."""
@@ -505,22 +671,18 @@ for var in list(globals().keys()):
         output: Optional[str] = None,
     ) -> None:
         """Add executed code to the history."""
-        import time
-
-        new_history = list(self.code_history)
-        new_history.append(
-            {
-                "code": code,
-                "execution_count": execution_count,
-                "timestamp": time.time(),
-                "success": success,
-                "output": output,
-            }
-        )
-        # Keep only the last 50 code executions
-        if len(new_history) > 50:
-            new_history = new_history[-50:]
-        self.code_history = new_history
+        entry = {
+            "code": code,
+            "execution_count": execution_count,
+            "timestamp": time.time(),
+            "success": success,
+            "output": output,
+        }
+        # Mutate in place and send only the new entry, like _append_chat
+        self.code_history.append(entry)
+        # Keep only the last MAX_CODE_HISTORY code executions
+        del self.code_history[:-MAX_CODE_HISTORY]
+        self.send({"type": "code_append", "entry": entry})
 
     def inspect_variable(self, var_name: str) -> Optional[Dict[str, Any]]:
         """Programmatically inspect a variable."""
@@ -553,29 +715,35 @@ for var in list(globals().keys()):
                 self.add_message("system", f"Error: {result.error['message']}")
 
         # Update state
-        self._update_kernel_state()
-        self._update_variables_info()
+        self._refresh_kernel_views()
 
         return result.to_dict()
 
     def _get_thread_id(self) -> str:
         """Get or create a thread ID for the current conversation."""
         if self._thread_id is None:
-            import uuid
-
             self._thread_id = str(uuid.uuid4())
         return self._thread_id
 
     def _get_kernel_context(self) -> KernelContext:
-        """Get current kernel context for the AI."""
+        """Get current kernel context for the AI.
+
+        The context is reused until code is executed, so back-to-back messages
+        don't rescan the namespace and notebook state.
+        """
+        # Changes for notebook cells and for code the agent runs silently
+        version = self.kernel.state_version
+        if self._context_cache is not None and self._context_cache[0] == version:
+            return self._context_cache[1]
+
         # Add kernel info
         kernel_info = self.kernel.get_kernel_info()
 
         # Add variable summaries (first 10)
         namespace = self.kernel.get_namespace()
         variables = []
-        for name, value in list(namespace.items())[:10]:
-            var_info = self.kernel.get_variable_info(name)
+        for name in itertools.islice(namespace, 10):
+            var_info = self._get_variable_info(name)
             if var_info:
                 variables.append(
                     {
@@ -624,7 +792,7 @@ for var in list(globals().keys()):
         # Add imported modules
         imported_modules = self.kernel.get_imported_modules()
 
-        return KernelContext(
+        context = KernelContext(
             kernel_info=kernel_info,
             variables=variables,
             recent_cells=recent_cells,
@@ -632,6 +800,8 @@ for var in list(globals().keys()):
             last_error=last_error,
             imported_modules=imported_modules,
         )
+        self._context_cache = (version, context)
+        return context
 
     def get_conversation_log_path(self) -> Optional[str]:
         """Get the current conversation log file path."""
@@ -655,6 +825,10 @@ for var in list(globals().keys()):
 
     def _on_code_executed(self, code: str, result: ExecutionResult) -> None:
         """Callback for when code is executed through the kernel interface."""
+        # The kernel state changed, so the AI context must be rebuilt
+        self._context_cache = None
+        self._var_info_cache.clear()
+
         # Add to code history
         self.add_code_to_history(
             code=code,
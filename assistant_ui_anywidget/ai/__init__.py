@@ -1,10 +1,22 @@
 """AI integration module for the assistant widget."""
 
-from .langgraph_service import LangGraphAIService, ChatResult
+import importlib
+from typing import TYPE_CHECKING, Any
+
 from .logger import ConversationLogger
 
-# Use LangGraph as the only AI service
-AIService = LangGraphAIService
+if TYPE_CHECKING:
+    from .langgraph_service import ChatResult, LangGraphAIService
+
+    AIService = LangGraphAIService
+
+# LangGraph and the LLM provider packages are only imported on first access
+# (PEP 562). Use LangGraph as the only AI service.
+_LAZY_IMPORTS = {
+    "AIService": "LangGraphAIService",
+    "LangGraphAIService": "LangGraphAIService",
+    "ChatResult": "ChatResult",
+}
 
 __all__ = [
     "AIService",
@@ -12,3 +24,16 @@ __all__ = [
     "ChatResult",
     "ConversationLogger",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(".langgraph_service", __name__)
+    value = getattr(module, _LAZY_IMPORTS[name])
+    globals()[name] = value  # Cache so __getattr__ is not hit again
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
@@ -1,83 +1,118 @@
 """AI service using LangGraph for extensible agent workflows."""
 
+import asyncio
+import functools
+import itertools
 import logging
 import os
 import uuid
 from dataclasses import dataclass
-from typing import Annotated, Any, Dict, List, Optional
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    TypedDict,
+)
 
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
+from langchain_core.caches import BaseCache
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import (
     AIMessage,
     AnyMessage,
     HumanMessage,
     SystemMessage,
+    ToolCall,
+    trim_messages,
 )
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, StateGraph
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
 from langgraph.types import Command, interrupt
-from pydantic import BaseModel, ConfigDict, Field
 
 from ..kernel_interface import KernelContext, KernelInterface
 from ..kernel_tools import create_kernel_tools
 from .logger import ConversationLogger
-from .prompt_config import SystemPromptConfig
+from .mock import MockLLM
+from .prompt_config import SYSTEM_PROMPT_FILE, SystemPromptConfig
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Opt-in on-disk cache of LLM responses, e.g. ASSISTANT_UI_LLM_CACHE=.langchain.db
+LLM_CACHE_ENV = "ASSISTANT_UI_LLM_CACHE"
+
 # Constants for approval decisions
 APPROVED = "approved"
 DENIED = "denied"
 
+# Graph input that resumes an interrupted graph, for each approval decision
+RESUME_COMMANDS: Dict[str | bool, Command] = {
+    True: Command(resume=APPROVED),
+    "Approve": Command(resume=APPROVED),
+    False: Command(resume=DENIED),
+    "Deny": Command(resume=DENIED),
+}
+
+# Id of the system message, which is kept at the start of the conversation
+SYSTEM_MESSAGE_ID = "system-prompt"
+
+# _llm_type of ChatAnthropic, whose prompt caching has to be requested
+ANTHROPIC_LLM_TYPE = "anthropic-chat"
+
+# Approximate token budget for the history sent to the LLM on each turn
+MAX_HISTORY_TOKENS = 32_000
+
+# Providers to auto-detect, in order: (provider, default model, API key variable)
+AUTO_DETECT_PROVIDERS = (
+    ("openai", "gpt-4o-mini", "OPENAI_API_KEY"),
+    ("anthropic", "claude-3-haiku-20240307", "ANTHROPIC_API_KEY"),
+    ("google_genai", "gemini-2.5-flash", "GOOGLE_API_KEY"),
+)
+
+# Tools that require approval
+APPROVAL_REQUIRED_TOOLS = frozenset(
+    {"execute_code", "write_file", "file_delete", "move_file", "copy_file"}
+)
 
-class AgentState(BaseModel):
-    """Pydantic model for the agent graph state.
 
-    This replaces the default MessagesState with runtime validation
-    and better type safety for our AI assistant.
+class AgentState(TypedDict, total=False):
+    """State of the agent graph.
+
+    A TypedDict rather than a Pydantic model, so LangGraph doesn't re-validate
+    the whole message history on every node transition.
     """
 
     # Core conversation messages
-    messages: Annotated[List[AnyMessage], add_messages] = Field(
-        default_factory=list, description="List of conversation messages"
-    )
-
-    # Optional kernel context information
-    kernel_context: Optional[Dict[str, Any]] = Field(
-        default=None, description="Current kernel state and context information"
-    )
+    messages: Annotated[List[AnyMessage], add_messages]
 
-    # Thread/session information
-    thread_id: Optional[str] = Field(
-        default=None, description="Unique identifier for the conversation thread"
-    )
+    # Unique identifier for the conversation thread
+    thread_id: Optional[str]
 
     # Approval state for code execution
-    pending_approval: bool = Field(
-        default=False, description="Whether code execution is pending approval"
-    )
-    approval_granted: Optional[bool] = Field(
-        default=None,
-        description="Whether approval was granted (None=not decided, True=approved, False=denied)",
-    )
-
-    # Error tracking
-    last_error: Optional[str] = Field(
-        default=None, description="Last error message if any"
-    )
+    pending_approval: bool
+    # None=not decided, True=approved, False=denied
+    approval_granted: Optional[bool]
 
-    # Use modern Pydantic v2 configuration
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+    # Last error message if any
+    last_error: Optional[str]
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ChatResult:
     """Result of a chat operation."""
 
@@ -94,93 +129,110 @@ class ChatResult:
         return self.interrupted and self.interrupt_message is not None
 
 
+@functools.lru_cache(maxsize=8)
+def cached_init_chat_model(model: str, provider: str, **kwargs: Any) -> BaseChatModel:
+    """Initialize a chat model, sharing it between services with the same arguments.
+
+    Reusing the model also reuses its HTTP client, so widgets in the same
+    notebook share one connection pool. Call ``cache_clear()`` to pick up
+    changed API keys.
+    """
+    return init_chat_model(model=model, model_provider=provider, **kwargs)
+
+
+def get_chat_model(model: str, provider: str, **kwargs: Any) -> BaseChatModel:
+    """Get a shared chat model, or a new one if the kwargs aren't hashable."""
+    try:
+        hash(tuple(kwargs.values()))
+    except TypeError:
+        return init_chat_model(model=model, model_provider=provider, **kwargs)
+    return cached_init_chat_model(model, provider, **kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def get_response_cache(path: str) -> BaseCache:
+    """Open the on-disk LLM response cache at ``path``, once per path."""
+    from langchain_community.cache import SQLiteCache
+
+    return SQLiteCache(database_path=path)
+
+
 def init_llm(
     model: Optional[str] = None,
     provider: Optional[str] = None,
     **kwargs: Any,
 ) -> BaseChatModel:
     """Initialize language model with simple provider detection."""
+    if (kwargs.get("temperature") or 0) > 0:
+        # Sampled responses differ per call, so never serve them from the cache
+        kwargs["cache"] = False
+    elif "cache" not in kwargs and (cache_path := os.getenv(LLM_CACHE_ENV)):
+        # Only models built here use the cache, not every model in the kernel
+        kwargs["cache"] = get_response_cache(cache_path)
 
     # If explicit provider given, use it
     if provider and provider != "auto":
         try:
             use_model = model or "gpt-4o-mini"
-            return init_chat_model(model=use_model, model_provider=provider, **kwargs)
+            return get_chat_model(use_model, provider, **kwargs)
         except Exception as e:
             logger.error(f"Failed to initialize {provider}/{model}: {e}")
 
     # Auto-detect: try providers in order based on available API keys
-    providers = [
-        ("openai", "gpt-4o-mini", "OPENAI_API_KEY"),
-        ("anthropic", "claude-3-haiku-20240307", "ANTHROPIC_API_KEY"),
-        ("google_genai", "gemini-2.5-flash", "GOOGLE_API_KEY"),
-    ]
-
-    for prov, default_model, env_var in providers:
+    for prov, default_model, env_var in AUTO_DETECT_PROVIDERS:
         if os.getenv(env_var):
             try:
                 use_model = model or default_model
                 logger.info(f"Initializing {prov} with model {use_model}")
-                return init_chat_model(model=use_model, model_provider=prov, **kwargs)
+                return get_chat_model(use_model, prov, **kwargs)
             except Exception as e:
                 logger.warning(f"Failed to initialize {prov}: {e}")
                 continue
 
     # Fallback to mock
     logger.warning("No AI provider available, using mock")
-    from .mock import MockLLM
-
     return MockLLM()
 
 
-def should_continue(state: AgentState) -> str:
-    """Determine if we should continue to tools or end."""
-    if not state.messages:
-        return str(END)
-
-    last_message = state.messages[-1]
+def get_tool_calls(state: AgentState) -> List[ToolCall]:
+    """Get the tool calls of the last message, if it is an AI message."""
+    messages = state.get("messages")
+    if not messages or not isinstance(messages[-1], AIMessage):
+        return []
+    return messages[-1].tool_calls
 
-    if isinstance(last_message, AIMessage) and last_message.tool_calls:
-        return "tools"
 
-    return str(END)
+def should_continue(state: AgentState) -> str:
+    """Determine if we should continue to tools or end."""
+    return "tools" if get_tool_calls(state) else END
 
 
 def should_require_approval(state: AgentState) -> str:
     """Determine if we need approval before executing tools."""
-    if not state.messages:
-        return str(END)
-
-    last_message = state.messages[-1]
+    tool_calls = get_tool_calls(state)
 
     # If no tool calls, we're done
-    if not isinstance(last_message, AIMessage) or not last_message.tool_calls:
-        return str(END)
-
-    # Tools that require approval
-    approval_required_tools = {
-        "execute_code",
-        "write_file",
-        "file_delete",
-        "move_file",
-        "copy_file",
-    }
+    if not tool_calls:
+        return END
 
     # Check if any tool call requires approval
-    for tool_call in last_message.tool_calls:
-        if tool_call["name"] in approval_required_tools:
-            return "approval"
+    if any(tc["name"] in APPROVAL_REQUIRED_TOOLS for tc in tool_calls):
+        return "approval"
 
     # Other tools don't need approval
     return "tools"
 
 
-def approval_node(state: AgentState) -> Dict[str, Any]:
-    """Node that handles approval for code execution and file operations."""
-    if not state.messages:
-        return {}
+def approval_node(state: AgentState) -> Command[Literal["tools", "agent"]]:
+    """Node that handles approval for code execution and file operations.
 
-    last_message = state.messages[-1]
+    Routes to the tools if approved, or back to the agent if denied. Returning
+    a Command updates the state and routes in the same step.
+    """
+    if not state.get("messages"):
+        return Command(goto="agent")
+
+    last_message = state["messages"][-1]
 
     # Extract operations that need approval
     operations = []
@@ -225,74 +277,75 @@ def approval_node(state: AgentState) -> Dict[str, Any]:
                     }
                 )
 
+    # Nothing needs approval, so skip the interrupt roundtrip
+    if not operations:
+        return Command(
+            goto="tools", update={"pending_approval": False, "approval_granted": True}
+        )
+
     # Create approval message
-    approval_msg = "Approve the following operations?\n\n"
-    for i, op in enumerate(operations, 1):
-        approval_msg += f"{i}. {op['content']}\n\n"
+    approval_msg = "Approve the following operations?\n\n" + "".join(
+        f"{i}. {op['content']}\n\n" for i, op in enumerate(operations, 1)
+    )
 
     # Interrupt for approval
     decision = interrupt({"message": approval_msg, "operations": operations})
 
     if decision != APPROVED:
-        # User denied - return message and mark as denied
+        # User denied - return to the agent to continue the conversation
         denial_msg = HumanMessage(content="Operation denied by user.")
-        return {
-            "messages": [denial_msg],
-            "pending_approval": False,
-            "approval_granted": False,
-        }
+        return Command(
+            goto="agent",
+            update={
+                "messages": [denial_msg],
+                "pending_approval": False,
+                "approval_granted": False,
+            },
+        )
 
     # Approved - continue to tools
-    return {"pending_approval": False, "approval_granted": True}
-
-
-def route_after_approval(state: AgentState) -> str:
-    """Route after approval - go to tools if approved, back to agent if denied."""
-    if state.approval_granted is True:
-        return "tools"
-    else:
-        # If approval was denied or not set, return to agent to continue conversation
-        return "agent"
-
+    return Command(
+        goto="tools", update={"pending_approval": False, "approval_granted": True}
+    )
 
-def build_context_message(context: KernelContext) -> str:
-    """Build context message."""
-    parts = []
 
+def iter_context_lines(context: KernelContext) -> Iterator[str]:
+    """Yield the lines of the context message."""
     info = context.kernel_info
-    parts.append(f"Kernel has {info.get('namespace_size', 0)} variables.")
+    yield f"Kernel has {info.get('namespace_size', 0)} variables."
 
     if context.variables:
-        var_names = [v["name"] for v in context.variables[:5]]
-        parts.append(f"Key variables: {', '.join(var_names)}")
+        var_names = ", ".join(v["name"] for v in itertools.islice(context.variables, 5))
+        yield f"Key variables: {var_names}"
 
     # Add notebook cell information
     if context.recent_cells:
-        parts.append("\nRECENT NOTEBOOK CELLS:")
+        yield "\nRECENT NOTEBOOK CELLS:"
         for cell in context.recent_cells:
             exec_count = cell.get("execution_count", "?")
             code = cell.get("input_code", "").strip()
             if len(code) > 100:
-                code = code[:100] + "..."
-            parts.append(f"Cell [{exec_count}]: {code}")
+                code = f"{code[:100]}..."
+            yield f"Cell [{exec_count}]: {code}"
 
     if context.notebook_summary:
         summary = context.notebook_summary
-        parts.append(
-            f"\nNotebook: {summary.get('executed_cells', 0)} executed cells, current execution count {summary.get('current_execution_count', 0)}"
-        )
+        yield f"\nNotebook: {summary.get('executed_cells', 0)} executed cells, current execution count {summary.get('current_execution_count', 0)}"
 
     if context.last_error:
         error = context.last_error
-        parts.append(f"Recent error: {error.get('message', 'Unknown error')}")
+        yield f"Recent error: {error.get('message', 'Unknown error')}"
 
     # Add imported modules information
     if context.imported_modules:
-        parts.append("\nIMPORTED MODULES:")
+        yield "\nIMPORTED MODULES:"
         for alias, module_info in context.imported_modules.items():
-            parts.append(f"  - {alias}: {module_info}")
+            yield f"  - {alias}: {module_info}"
 
-    return "\n".join(parts) if parts else "Kernel context available."
+
+def build_context_message(context: KernelContext) -> str:
+    """Build context message."""
+    return "\n".join(iter_context_lines(context))
 
 
 def extract_tool_calls_from_message(
@@ -307,32 +360,111 @@ def extract_tool_calls_from_message(
     return None
 
 
+def get_message_text(message: AnyMessage) -> str:
+    """Get the content of a message as a string, joining list content."""
+    content = message.content
+    if isinstance(content, list):
+        return "\n".join(map(str, content))
+    return str(content or "")
+
+
+def get_chunk_text(content: Any) -> str:
+    """Get the text of a streamed message chunk.
+
+    Some providers (e.g. Anthropic) stream a list of content blocks, which
+    can also hold partial tool call arguments that shouldn't be shown.
+    """
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in content
+        if isinstance(block, str) or block.get("type") == "text"
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def load_system_prompt(require_approval: bool, mtime_ns: int) -> str:
+    """Load the system prompt; ``mtime_ns`` invalidates the cache on edits."""
+    config = SystemPromptConfig()
+    return config.get_full_prompt(require_approval=require_approval)
+
+
 def get_system_prompt(require_approval: bool = True) -> str:
     """Get the detailed system prompt for the AI assistant.
 
     This uses a Pydantic model to ensure all fields are properly loaded
-    and validated from the YAML file. Reloads configuration each time.
+    and validated from the YAML file. Reloads configuration whenever the
+    YAML file changes.
     """
-    config = SystemPromptConfig()
-    return config.get_full_prompt(require_approval=require_approval)
+    return load_system_prompt(require_approval, SYSTEM_PROMPT_FILE.stat().st_mtime_ns)
+
 
+def trim_history(
+    messages: List[AnyMessage], max_tokens: Optional[int] = None
+) -> List[AnyMessage]:
+    """Keep the system message and the most recent turns that fit the budget.
 
-def create_call_model(llm: BaseChatModel, tools: List[Any]) -> Any:
+    ``max_tokens`` defaults to ``MAX_HISTORY_TOKENS``.
+    """
+    trimmed: List[AnyMessage] = trim_messages(
+        messages,
+        max_tokens=MAX_HISTORY_TOKENS if max_tokens is None else max_tokens,
+        strategy="last",
+        token_counter=count_tokens_approximately,
+        include_system=True,
+        # Don't start with tool results whose tool call was dropped
+        start_on="human",
+    )
+    if any(isinstance(m, HumanMessage) for m in trimmed):
+        return trimmed
+
+    # Even the current turn doesn't fit (e.g. after a large tool result), so
+    # keep just the system message and that turn
+    last_human = next(
+        (
+            i
+            for i in range(len(messages) - 1, -1, -1)
+            if isinstance(messages[i], HumanMessage)
+        ),
+        None,
+    )
+    if last_human is None:
+        return messages
+    system = messages[:1] if isinstance(messages[0], SystemMessage) else []
+    return system + messages[last_human:]
+
+
+def create_call_model(
+    llm: BaseChatModel, tools: List[Any], max_history_tokens: Optional[int] = None
+) -> Any:
     """Create the call_model function for the agent graph."""
+    # Bind once; the tool schemas don't change for the lifetime of the graph
+    llm_with_tools = llm.bind_tools(tools)
 
-    def call_model(state: AgentState) -> Dict[str, Any]:
+    def call_model(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
         """Call the LLM with tools (synchronous version)."""
-        response = llm.bind_tools(tools).invoke(state.messages)
+        messages = trim_history(state["messages"], max_history_tokens)
+        response = llm_with_tools.invoke(messages, config)
         return {"messages": [response]}
 
-    return call_model
+    async def acall_model(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        """Call the LLM with tools without blocking the event loop."""
+        # Pass the config explicitly so streaming callbacks work on Python < 3.11
+        messages = trim_history(state["messages"], max_history_tokens)
+        response = await llm_with_tools.ainvoke(messages, config)
+        return {"messages": [response]}
+
+    # invoke() uses call_model and ainvoke() uses acall_model
+    return RunnableLambda(call_model, afunc=acall_model, name="call_model")
 
 
 def create_agent_graph(
     kernel: KernelInterface,
     llm: BaseChatModel,
-    memory: MemorySaver,
+    memory: BaseCheckpointSaver,
     require_approval: bool,
+    max_history_tokens: Optional[int] = None,
 ) -> Any:  # Using Any to bypass CompiledStateGraph type issues for now
     """Create the LangGraph agent with approval flow."""
     graph: StateGraph[AgentState] = StateGraph(AgentState)
@@ -341,7 +473,7 @@ def create_agent_graph(
     tools = create_kernel_tools(kernel)
 
     # Create call_model function
-    call_model = create_call_model(llm, tools)
+    call_model = create_call_model(llm, tools, max_history_tokens)
 
     # Add nodes
     graph.add_node("agent", call_model)
@@ -350,17 +482,12 @@ def create_agent_graph(
     if require_approval:
         graph.add_node("approval", approval_node)
 
-        # Add conditional edges with approval
+        # Add conditional edges with approval; approval_node routes itself
         graph.add_conditional_edges(
             "agent",
             should_require_approval,
             {"tools": "tools", "approval": "approval", END: END},
         )
-        graph.add_conditional_edges(
-            "approval",
-            route_after_approval,
-            {"tools": "tools", "agent": "agent"},
-        )
     else:
         # Direct routing without approval
         graph.add_conditional_edges(
@@ -384,25 +511,56 @@ class LangGraphAIService:
         model: Optional[str] = None,
         provider: Optional[str] = None,
         require_approval: bool = True,
+        checkpointer: Optional[BaseCheckpointSaver] = None,
+        max_history_tokens: Optional[int] = None,
+        use_prompt_cache: bool = True,
         **kwargs: Any,
     ):
-        """Initialize the AI service."""
+        """Initialize the AI service.
+
+        ``checkpointer`` stores the conversation state between turns. It
+        defaults to an in-memory saver; pass e.g. an ``AsyncSqliteSaver`` for
+        durable conversations or to keep long histories out of memory.
+
+        ``max_history_tokens`` bounds the (approximate) number of tokens of
+        history sent to the LLM on each turn, see ``MAX_HISTORY_TOKENS``.
+
+        ``use_prompt_cache`` marks the system prompt as cacheable for Anthropic
+        models, so its prefill is reused between calls. OpenAI caches long
+        prompt prefixes automatically.
+
+        Extra keyword arguments are passed to the chat model, e.g.
+        ``cache=InMemoryCache()`` to reuse responses to identical prompts.
+        """
         self.kernel = kernel
         self.require_approval = require_approval
         self.llm = init_llm(model, provider, **kwargs)
 
+        # Load the prompt once instead of re-reading the YAML on every message
+        self.system_prompt = get_system_prompt(self.require_approval)
+        self.use_prompt_cache = (
+            use_prompt_cache and self.llm._llm_type == ANTHROPIC_LLM_TYPE
+        )
+        self.system_message = self._make_system_message()
+        # System message for the last kernel context, reused until it changes
+        self._context_system_message: Optional[Tuple[KernelContext, SystemMessage]] = (
+            None
+        )
+
         # Create memory for conversation history
-        self.memory = MemorySaver()
+        self.memory = checkpointer if checkpointer is not None else MemorySaver()
 
         # Create the agent graph
         self.agent = create_agent_graph(
-            self.kernel, self.llm, self.memory, self.require_approval
+            self.kernel,
+            self.llm,
+            self.memory,
+            self.require_approval,
+            max_history_tokens,
         )
 
-        # Initialize conversation logger
+        # Initialize conversation logger; the log file is created on first use
         self.conversation_logger = ConversationLogger()
-        log_path = self.conversation_logger.start_session()
-        logger.info(f"Started conversation logging to: {log_path}")
 
     def chat(
         self,
@@ -412,120 +570,231 @@ class LangGraphAIService:
     ) -> ChatResult:
         """Send message and get response (synchronous version)."""
         if thread_id is None:
-            thread_id = str(uuid.uuid4())
+            thread_id = uuid.uuid4().hex
 
         try:
-            # Build the payload
-            if isinstance(message, bool):
-                # Approval decision
-                payload = Command(resume=APPROVED if message else DENIED)
-            elif message == "Approve":
-                # Button approval
-                payload = Command(resume=APPROVED)
-            elif message == "Deny":
-                # Button denial
-                payload = Command(resume=DENIED)
-            else:
-                # Normal message
-                messages = []
-                # Always add our custom system prompt first
-                system_prompt = get_system_prompt(self.require_approval)
-
-                # If we have context, append it to the system prompt
-                if context:
-                    context_msg = build_context_message(context)
-                    full_system_content = (
-                        f"{system_prompt}\n\n**CURRENT KERNEL STATE:**\n{context_msg}"
-                    )
-                else:
-                    full_system_content = system_prompt
-
-                messages.append(SystemMessage(content=full_system_content))
-                messages.append(HumanMessage(content=message))
-
-                # Create AgentState payload with additional context
-                payload = {
-                    "messages": messages,
-                    "thread_id": thread_id,
-                    "kernel_context": context.to_dict() if context else None,
-                }
-
-            # Invoke the agent
+            payload = self._build_payload(message, thread_id, context)
             config = {"configurable": {"thread_id": thread_id}}
             response: Dict[str, Any] = self.agent.invoke(payload, config)
+            return self._build_result(response, message, thread_id, context)
+        except Exception as e:
+            return self._build_error_result(e, message, thread_id, context)
 
-            # Check if interrupted for approval
-            if "__interrupt__" in response:
-                interrupt_msg = response["__interrupt__"][0].value.get(
-                    "message", "Approval needed"
-                )
+    async def achat(
+        self,
+        message: str | bool,
+        thread_id: Optional[str] = None,
+        context: Optional[KernelContext] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+    ) -> ChatResult:
+        """Send message and get response without blocking the event loop.
 
-                self.conversation_logger.log_conversation(
-                    thread_id=thread_id,
-                    user_message=str(message),
-                    ai_response="[Awaiting approval]",
-                    context=context,
-                )
+        If ``on_token`` is given, it is called with each chunk of AI text as it
+        is generated.
+        """
+        if thread_id is None:
+            thread_id = uuid.uuid4().hex
 
-                return ChatResult(
-                    content="",
-                    thread_id=thread_id,
-                    interrupted=True,
-                    interrupt_message=interrupt_msg,
-                )
+        try:
+            payload = self._build_payload(message, thread_id, context)
+            config = {"configurable": {"thread_id": thread_id}}
+            if on_token is None:
+                response: Dict[str, Any] = await self.agent.ainvoke(payload, config)
+            else:
+                response = await self._astream_graph(payload, config, on_token)
+            return self._build_result(response, message, thread_id, context)
+        except Exception as e:
+            return self._build_error_result(e, message, thread_id, context)
 
-            # Extract response
-            messages = response.get("messages", [])
-            if not messages:
-                return ChatResult(
-                    content="No response from AI.",
-                    thread_id=thread_id,
-                    success=False,
-                    error="Empty message list in response.",
+    async def abatch_chat(
+        self,
+        requests: Sequence[Tuple[str, str | bool, Optional[KernelContext]]],
+    ) -> List[ChatResult]:
+        """Run independent ``(thread_id, message, context)`` requests concurrently.
+
+        The model calls overlap and share the chat model's connection pool.
+        Errors are returned per request, as in ``achat``.
+        """
+        return list(
+            await asyncio.gather(
+                *(
+                    self.achat(message, thread_id, context)
+                    for thread_id, message, context in requests
                 )
+            )
+        )
 
-            last_message: AnyMessage = messages[-1]
-            content = "No content"
-
-            if isinstance(last_message, AIMessage):
-                # Handle cases where content might be a list
-                if isinstance(last_message.content, list):
-                    content = "\n".join(str(item) for item in last_message.content)
-                else:
-                    content = str(last_message.content or "")
-            elif isinstance(last_message, HumanMessage):
-                content = str(last_message.content)
+    async def _astream_graph(
+        self,
+        payload: Any,
+        config: Dict[str, Any],
+        on_token: Callable[[str], None],
+    ) -> Dict[str, Any]:
+        """Run the agent like ``ainvoke``, passing AI text chunks to ``on_token``."""
+        response: Dict[str, Any] = {}
+        interrupts: List[Any] = []
+        async for mode, chunk in self.agent.astream(
+            payload, config, stream_mode=["messages", "updates", "values"]
+        ):
+            if mode == "messages":
+                message, metadata = chunk
+                # Only stream the model's text, not tool results
+                if metadata.get("langgraph_node") != "agent":
+                    continue
+                text = get_chunk_text(message.content)
+                if text:
+                    on_token(text)
+            elif mode == "updates" and "__interrupt__" in chunk:
+                interrupts.extend(chunk["__interrupt__"])
+            elif mode == "values":
+                response = chunk
+
+        # Match the shape ainvoke() returns when the graph is interrupted
+        if interrupts:
+            response = {**response, "__interrupt__": interrupts}
+        return response
+
+    def _build_payload(
+        self,
+        message: str | bool,
+        thread_id: str,
+        context: Optional[KernelContext],
+    ) -> Any:
+        """Build the graph input for a user message or an approval decision."""
+        # Approval decision, either as a bool or from the buttons
+        command = RESUME_COMMANDS.get(message)
+        if command is not None:
+            return command
+
+        # Normal message
+        # Always add our custom system prompt first
+        # If we have context, append it to the system prompt
+        system_message = (
+            self._get_context_system_message(context)
+            if context
+            else self.system_message
+        )
+        messages = [system_message, HumanMessage(content=message)]
+
+        # Create AgentState payload. The kernel context is already part of the
+        # system message, so it isn't stored (and checkpointed) a second time.
+        return {"messages": messages, "thread_id": thread_id}
+
+    def _get_context_system_message(self, context: KernelContext) -> SystemMessage:
+        """Get the system message with the kernel state appended.
+
+        The widget reuses the same KernelContext until code is executed, so
+        the message is only rebuilt when a different context is passed.
+        """
+        cached = self._context_system_message
+        if cached is None or cached[0] is not context:
+            kernel_state = (
+                f"**CURRENT KERNEL STATE:**\n{build_context_message(context)}"
+            )
+            system_message = self._make_system_message(kernel_state)
+            cached = self._context_system_message = (context, system_message)
+        return cached[1]
+
+    def _make_system_message(self, kernel_state: Optional[str] = None) -> SystemMessage:
+        """Build the system message, with the kernel state after the prompt."""
+        content: str | List[str | Dict[str, Any]]
+        if self.use_prompt_cache:
+            # Cache the prompt as a prefix; the kernel state changes every turn
+            content = [
+                {
+                    "type": "text",
+                    "text": self.system_prompt,
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ]
+            if kernel_state:
+                content.append({"type": "text", "text": kernel_state})
+        elif kernel_state:
+            content = f"{self.system_prompt}\n\n{kernel_state}"
+        else:
+            content = self.system_prompt
+        # A fixed id makes add_messages replace the system message from the
+        # previous turn in place, instead of appending one per turn
+        return SystemMessage(content=content, id=SYSTEM_MESSAGE_ID)
+
+    def _build_result(
+        self,
+        response: Dict[str, Any],
+        message: str | bool,
+        thread_id: str,
+        context: Optional[KernelContext],
+    ) -> ChatResult:
+        """Convert the graph output into a ChatResult and log the exchange."""
+        # Check if interrupted for approval
+        if "__interrupt__" in response:
+            interrupt_msg = response["__interrupt__"][0].value.get(
+                "message", "Approval needed"
+            )
 
-            # Log conversation
             self.conversation_logger.log_conversation(
                 thread_id=thread_id,
                 user_message=str(message),
-                ai_response=content,
-                tool_calls=extract_tool_calls_from_message(last_message),
+                ai_response="[Awaiting approval]",
                 context=context,
             )
 
             return ChatResult(
-                content=content,
+                content="",
                 thread_id=thread_id,
-                success=True,
-            )
-
-        except Exception as e:
-            logger.error(f"Error in chat: {e}")
-            error_msg = f"I encountered an error: {str(e)}"
-
-            self.conversation_logger.log_conversation(
-                thread_id=thread_id,
-                user_message=str(message),
-                ai_response=error_msg,
-                context=context,
-                error=str(e),
+                interrupted=True,
+                interrupt_message=interrupt_msg,
             )
 
+        # Extract response
+        messages = response.get("messages", [])
+        if not messages:
             return ChatResult(
-                content=error_msg,
+                content="No response from AI.",
                 thread_id=thread_id,
                 success=False,
-                error=str(e),
+                error="Empty message list in response.",
             )
+
+        last_message: AnyMessage = messages[-1]
+        content = get_message_text(last_message)
+
+        # Log conversation
+        self.conversation_logger.log_conversation(
+            thread_id=thread_id,
+            user_message=str(message),
+            ai_response=content,
+            tool_calls=extract_tool_calls_from_message(last_message),
+            context=context,
+        )
+
+        return ChatResult(
+            content=content,
+            thread_id=thread_id,
+            success=True,
+        )
+
+    def _build_error_result(
+        self,
+        e: Exception,
+        message: str | bool,
+        thread_id: str,
+        context: Optional[KernelContext],
+    ) -> ChatResult:
+        """Log a failed exchange and wrap the error in a ChatResult."""
+        logger.error(f"Error in chat: {e}")
+        error_msg = f"I encountered an error: {str(e)}"
+
+        self.conversation_logger.log_conversation(
+            thread_id=thread_id,
+            user_message=str(message),
+            ai_response=error_msg,
+            context=context,
+            error=str(e),
+        )
+
+        return ChatResult(
+            content=error_msg,
+            thread_id=thread_id,
+            success=False,
+            error=str(e),
+        )
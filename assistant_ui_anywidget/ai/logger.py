@@ -1,16 +1,80 @@
 """Conversation logger for AI interactions."""
 
+import atexit
 import json
+import logging
+import queue
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TYPE_CHECKING
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from ..kernel_interface import KernelContext
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_DIR = "ai_conversation_logs"
+
+
+def to_json_line(entry: Dict[str, Any]) -> str:
+    """Serialize a log entry as a single compact JSON line."""
+    return json.dumps(entry, separators=(",", ":")) + "\n"
+
+
+# Entries are written by one background thread shared by all loggers, off the
+# chat response path. Each entry carries the file it belongs to.
+_queue: "queue.Queue[Tuple[Path, Dict[str, Any]]]" = queue.Queue()
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+
+def _start_writer() -> None:
+    """Start the shared writer thread if it isn't running yet."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(
+                target=_write_entries, name="conversation-logger", daemon=True
+            )
+            _writer.start()
+            # Don't lose queued entries when the kernel shuts down
+            atexit.register(flush)
+
+
+def flush() -> None:
+    """Wait until all queued conversations are written to disk."""
+    _queue.join()
+
+
+def _write_entries() -> None:
+    """Write queued conversation entries to their log files."""
+    while True:
+        # Write everything that queued up during the last write at once
+        entries = [_queue.get()]
+        while not _queue.empty():
+            entries.append(_queue.get())
+        by_file: Dict[Path, List[Dict[str, Any]]] = {}
+        for path, conversation in entries:
+            by_file.setdefault(path, []).append(conversation)
+        try:
+            for path, conversations in by_file.items():
+                with open(path, "a") as f:
+                    f.writelines(map(to_json_line, conversations))
+        except Exception:
+            logger.exception("Failed to write conversation log")
+        finally:
+            for _ in entries:
+                _queue.task_done()
+
 
 class ConversationLogger:
-    """Logs AI conversations to timestamped files."""
+    """Logs AI conversations to timestamped JSON Lines files.
+
+    The first line holds the session metadata and every following line one
+    conversation exchange, so logging a turn only appends to the file.
+    Older ``.json`` logs hold the whole session as one JSON document.
+    """
 
     def __init__(self, log_dir: Optional[str] = None):
         """Initialize the logger.
@@ -18,26 +82,31 @@ class ConversationLogger:
         Args:
             log_dir: Directory to store logs. Defaults to 'ai_conversation_logs'
         """
-        self.log_dir = Path(log_dir or "ai_conversation_logs")
-        self.log_dir.mkdir(exist_ok=True)
+        self.log_dir = Path(log_dir or DEFAULT_LOG_DIR)
         self.current_log_file: Optional[Path] = None
         self.session_start: Optional[datetime] = None
+        self._session_end: Optional[str] = None
+        self._conversation_count = 0
 
     def start_session(self) -> Path:
         """Start a new logging session with timestamp."""
         self.session_start = datetime.now()
         timestamp = self.session_start.strftime("%Y%m%d_%H%M%S")
-        self.current_log_file = self.log_dir / f"conversation_{timestamp}.json"
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.current_log_file = self.log_dir / f"conversation_{timestamp}.jsonl"
+        self._session_end = None
+        self._conversation_count = 0
 
         # Initialize log file with metadata
-        initial_data = {
+        metadata = {
+            "type": "session",
             "session_start": self.session_start.isoformat(),
             "session_id": timestamp,
-            "conversations": [],
         }
 
         with open(self.current_log_file, "w") as f:
-            json.dump(initial_data, f, indent=2)
+            f.write(to_json_line(metadata))
+        logger.info(f"Started conversation logging to: {self.current_log_file}")
 
         return self.current_log_file
 
@@ -63,16 +132,14 @@ class ConversationLogger:
         if not self.current_log_file:
             self.start_session()
 
-        # Load existing data
         assert (
             self.current_log_file is not None
         )  # mypy hint: guaranteed by start_session()
-        with open(self.current_log_file, "r") as f:
-            data = json.load(f)
 
         # Create conversation entry
+        timestamp = datetime.now().isoformat()
         conversation = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": timestamp,
             "thread_id": thread_id,
             "user_message": user_message,
             "ai_response": ai_response,
@@ -81,15 +148,16 @@ class ConversationLogger:
             "error": error,
         }
 
-        # Append to conversations
-        data["conversations"].append(conversation)
+        # Bind the entry to this session's file, even if a new one starts
+        _start_writer()
+        _queue.put((self.current_log_file, conversation))
 
-        # Update session end time
-        data["session_end"] = datetime.now().isoformat()
+        self._conversation_count += 1
+        self._session_end = timestamp
 
-        # Write back to file
-        with open(self.current_log_file, "w") as f:
-            json.dump(data, f, indent=2)
+    def flush(self) -> None:
+        """Wait until all logged conversations are written to disk."""
+        flush()
 
     def get_current_log_path(self) -> Optional[Path]:
         """Get the current log file path."""
@@ -97,16 +165,18 @@ class ConversationLogger:
 
     def get_session_summary(self) -> Dict[str, Any]:
         """Get a summary of the current session."""
+        self.flush()
         if not self.current_log_file or not self.current_log_file.exists():
             return {"status": "No active session"}
 
+        # Only the metadata line is read; the rest is tracked while writing
         with open(self.current_log_file, "r") as f:
-            data = json.load(f)
+            metadata = json.loads(f.readline())
 
         return {
-            "session_id": data.get("session_id"),
-            "session_start": data.get("session_start"),
-            "session_end": data.get("session_end"),
-            "total_conversations": len(data.get("conversations", [])),
+            "session_id": metadata.get("session_id"),
+            "session_start": metadata.get("session_start"),
+            "session_end": self._session_end,
+            "total_conversations": self._conversation_count,
             "log_file": str(self.current_log_file),
         }
@@ -10,6 +10,8 @@ from pydantic_settings import (
     YamlConfigSettingsSource,
 )
 
+SYSTEM_PROMPT_FILE = Path(__file__).parent / "system_prompt.yaml"
+
 
 class SystemPromptConfig(BaseSettings):
     """System prompt configuration loaded from YAML file."""
@@ -48,10 +50,9 @@ class SystemPromptConfig(BaseSettings):
         file_secret_settings: PydanticBaseSettingsSource,
     ) -> Tuple[PydanticBaseSettingsSource, ...]:
         """Configure pydantic-settings to load from YAML file."""
-        yaml_file = Path(__file__).parent / "system_prompt.yaml"
         return (
             init_settings,
-            YamlConfigSettingsSource(settings_cls, yaml_file=yaml_file),
+            YamlConfigSettingsSource(settings_cls, yaml_file=SYSTEM_PROMPT_FILE),
             env_settings,
             file_secret_settings,
         )
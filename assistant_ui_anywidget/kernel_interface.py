@@ -1,9 +1,14 @@
 """Kernel interface for interacting with the IPython kernel."""
 
+import inspect
+import io
 import sys
+import threading
+import time
 import traceback
+from contextlib import redirect_stderr, redirect_stdout
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 try:
     from IPython import get_ipython
@@ -186,12 +191,27 @@ class KernelInterface:
         self._execution_callback: Optional[Any] = (
             None  # Callback for code execution tracking
         )
+        # Counts execute_code calls, which may not bump the shell's count
+        self._executions = 0
+        # The agent runs tool calls in parallel threads; code runs one at a time.
+        # Reentrant, so executed code may itself call execute_code.
+        self._execution_lock = threading.RLock()
 
     @property
     def is_available(self) -> bool:
         """Check if kernel is available."""
         return self.shell is not None
 
+    @property
+    def state_version(self) -> Tuple[int, int]:
+        """A value that changes whenever code runs in the kernel.
+
+        Covers both notebook cells and (possibly silent) execute_code calls,
+        so it can be used to invalidate caches of namespace reads.
+        """
+        execution_count = self.shell.execution_count if self.shell else 0
+        return (execution_count, self._executions)
+
     def set_execution_callback(self, callback: Any) -> None:
         """Set a callback to be called whenever code is executed.
 
@@ -303,7 +323,16 @@ class KernelInterface:
     def execute_code(
         self, code: str, silent: bool = False, store_history: bool = True
     ) -> ExecutionResult:
-        """Execute code in the kernel and capture output."""
+        """Execute code in the kernel and capture output.
+
+        Calls from different threads are serialized.
+        """
+        with self._execution_lock:
+            return self._execute_code(code, silent, store_history)
+
+    def _execute_code(
+        self, code: str, silent: bool, store_history: bool
+    ) -> ExecutionResult:
         if not self.is_available:
             return ExecutionResult(
                 success=False,
@@ -318,10 +347,7 @@ class KernelInterface:
         before_vars = set(self.get_namespace().keys())
 
         # Execute the code
-        import time
-        import io
-        from contextlib import redirect_stdout, redirect_stderr
-
+        self._executions += 1
         start_time = time.time()
         stdout_buffer = io.StringIO()
         stderr_buffer = io.StringIO()
@@ -474,8 +500,6 @@ class KernelInterface:
 
         try:
             # Get current stack
-            import inspect
-
             stack = inspect.stack()
 
             for i, frame_info in enumerate(stack[:max_frames]):
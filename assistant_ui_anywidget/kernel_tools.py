@@ -1,15 +1,20 @@
 """Kernel-specific tools for LangGraph agent."""
 
+import collections
+import fnmatch
+import heapq
 import os
 import subprocess
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, Callable, Dict, List, Optional, Type
 from langchain_core.tools import BaseTool
 from langchain_community.agent_toolkits import FileManagementToolkit
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from .kernel_interface import KernelInterface
 from .module_inspector import ModuleInspector
 
+KERNEL_UNAVAILABLE = "Kernel is not available"
+
 
 class InspectVariableInput(BaseModel):
     """Input for inspect_variable tool."""
@@ -44,7 +49,31 @@ class GetVariablesInput(BaseModel):
     )
 
 
-class InspectVariableTool(BaseTool):
+class ReadOnlyKernelTool(BaseTool):
+    """Base for kernel tools that only read the kernel state.
+
+    Results are reused for identical arguments until code runs in the kernel.
+    """
+
+    kernel: Any = Field(default=None, exclude=True)  # Exclude from serialization
+    _results: Dict[Any, str] = PrivateAttr(default_factory=dict)
+    _results_version: Any = PrivateAttr(default=None)
+
+    def __init__(self, kernel: KernelInterface, **kwargs: Any) -> None:
+        super().__init__(kernel=kernel, **kwargs)
+
+    def _cached(self, key: Any, compute: Callable[[], str]) -> str:
+        """Return the result for ``key``, computing it if the kernel changed."""
+        version = self.kernel.state_version
+        if version != self._results_version:
+            self._results.clear()
+            self._results_version = version
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+
+
+class InspectVariableTool(ReadOnlyKernelTool):
     """Tool for inspecting variables in the kernel."""
 
     name: str = "inspect_variable"
@@ -54,15 +83,19 @@ class InspectVariableTool(BaseTool):
         "Returns type, size, shape (for arrays/dataframes), and a preview of the data."
     )
     args_schema: Type[BaseModel] = InspectVariableInput
-    kernel: Any = Field(default=None, exclude=True)  # Exclude from serialization
 
     def __init__(self, kernel: KernelInterface, **kwargs: Any) -> None:
         super().__init__(kernel=kernel, **kwargs)
 
     def _run(self, variable_name: str, deep: bool = False) -> str:
         """Inspect a variable and return formatted information."""
+        return self._cached(
+            (variable_name, deep), lambda: self._inspect(variable_name, deep)
+        )
+
+    def _inspect(self, variable_name: str, deep: bool) -> str:
         if not self.kernel.is_available:
-            return "Kernel is not available"
+            return KERNEL_UNAVAILABLE
 
         var_info = self.kernel.get_variable_info(variable_name, deep=deep)
         if var_info is None:
@@ -110,7 +143,7 @@ class ExecuteCodeTool(BaseTool):
     def _run(self, code: str, silent: bool = False) -> str:
         """Execute code and return the result."""
         if not self.kernel.is_available:
-            return "Kernel is not available"
+            return KERNEL_UNAVAILABLE
 
         result = self.kernel.execute_code(code, silent=silent)
 
@@ -145,8 +178,17 @@ class ExecuteCodeTool(BaseTool):
 
         return "\n".join(lines)
 
+    async def _arun(self, code: str, silent: bool = False) -> str:
+        """Execute code on the event loop's thread instead of a worker thread.
+
+        Output is captured by redirecting the process-wide stdout and stderr,
+        so running code while the loop is free to run a notebook cell would
+        mix their output.
+        """
+        return self._run(code, silent=silent)
 
-class GetVariablesTool(BaseTool):
+
+class GetVariablesTool(ReadOnlyKernelTool):
     """Tool for listing variables in the kernel."""
 
     name: str = "get_variables"
@@ -155,7 +197,6 @@ class GetVariablesTool(BaseTool):
         "'show variables', 'list variables', or want to see what's available in the kernel."
     )
     args_schema: Type[BaseModel] = GetVariablesInput
-    kernel: Any = Field(default=None, exclude=True)
 
     def __init__(self, kernel: KernelInterface, **kwargs: Any) -> None:
         super().__init__(kernel=kernel, **kwargs)
@@ -164,13 +205,19 @@ class GetVariablesTool(BaseTool):
         self, include_private: bool = False, type_filter: Optional[str] = None
     ) -> str:
         """List variables in the namespace."""
+        return self._cached(
+            (include_private, type_filter),
+            lambda: self._list(include_private, type_filter),
+        )
+
+    def _list(self, include_private: bool, type_filter: Optional[str]) -> str:
         if not self.kernel.is_available:
-            return "Kernel is not available"
+            return KERNEL_UNAVAILABLE
 
         namespace = self.kernel.get_namespace()
 
         # Group variables by type
-        vars_by_type: Dict[str, List[str]] = {}
+        vars_by_type: Dict[str, List[str]] = collections.defaultdict(list)
 
         for name, value in namespace.items():
             if not include_private and name.startswith("_"):
@@ -181,36 +228,35 @@ class GetVariablesTool(BaseTool):
             if type_filter and type_filter.lower() not in type_name.lower():
                 continue
 
-            if type_name not in vars_by_type:
-                vars_by_type[type_name] = []
             vars_by_type[type_name].append(name)
 
         # Format the output
         lines = [f"Variables in namespace ({len(namespace)} total):"]
 
-        for type_name in sorted(vars_by_type.keys()):
-            var_names = sorted(vars_by_type[type_name])
+        for type_name, var_names in sorted(vars_by_type.items()):
             lines.append(f"\n{type_name} ({len(var_names)}):")
-            for name in var_names[:10]:  # Show first 10 of each type
-                lines.append(f"  - {name}")
+            # Show first 10 of each type, without sorting all of them
+            lines.extend(f"  - {name}" for name in heapq.nsmallest(10, var_names))
             if len(var_names) > 10:
                 lines.append(f"  ... and {len(var_names) - 10} more")
 
         return "\n".join(lines)
 
 
-class KernelInfoTool(BaseTool):
+class KernelInfoTool(ReadOnlyKernelTool):
     """Tool for getting kernel information."""
 
     name: str = "kernel_info"
     description: str = "Get information about the current kernel state including availability and execution count."
-    kernel: Any = Field(default=None, exclude=True)
 
     def __init__(self, kernel: KernelInterface, **kwargs: Any) -> None:
         super().__init__(kernel=kernel, **kwargs)
 
     def _run(self) -> str:
         """Get kernel information."""
+        return self._cached((), self._info)
+
+    def _info(self) -> str:
         info = self.kernel.get_kernel_info()
 
         lines = [
@@ -287,7 +333,7 @@ class GetNotebookStateTool(BaseTool):
     def _run(self, recent_only: bool = True, limit: int = 10) -> str:
         """Get notebook state."""
         if not self.kernel.is_available:
-            return "Kernel is not available"
+            return KERNEL_UNAVAILABLE
 
         notebook_state = self.kernel.get_notebook_state()
 
@@ -356,7 +402,7 @@ class SearchNotebookTool(BaseTool):
     def _run(self, search_term: str, case_sensitive: bool = False) -> str:
         """Search notebook cells."""
         if not self.kernel.is_available:
-            return "Kernel is not available"
+            return KERNEL_UNAVAILABLE
 
         matching_cells = self.kernel.search_cells_by_content(
             search_term, case_sensitive
@@ -404,7 +450,7 @@ class GetCellTool(BaseTool):
     def _run(self, cell_number: int) -> str:
         """Get specific cell."""
         if not self.kernel.is_available:
-            return "Kernel is not available"
+            return KERNEL_UNAVAILABLE
 
         cell = self.kernel.get_cell_by_number(cell_number)
 
@@ -636,8 +682,6 @@ class ListFilesTool(BaseTool):
 
             else:
                 # List all files using os.listdir or os.walk
-                import fnmatch
-
                 if recursive:
                     files = []
                     for root, dirs, filenames in os.walk(directory):
@@ -830,8 +874,6 @@ class GitFindTool(BaseTool):
             )
 
             # Filter by name pattern
-            import fnmatch
-
             pattern = name_pattern if case_sensitive else name_pattern.lower()
 
             matching_files = []
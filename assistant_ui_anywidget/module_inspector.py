@@ -1,6 +1,7 @@
 """Module inspection utilities for reading source code of imported modules."""
 
 import inspect
+import re
 import sys
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
@@ -110,8 +111,6 @@ class ModuleInspector:
         Returns:
             List of (module_path, line_number, function_name) tuples
         """
-        import re
-
         references = []
         pattern = r'File "([^"]+)", line (\d+), in (.+)'
 
@@ -1,5 +1,6 @@
 """Simplified message handlers for kernel interaction."""
 
+import re
 import time
 from typing import Any, Dict, List, Optional
 
@@ -68,8 +69,6 @@ class SimpleHandlers:
                 continue
 
             if pattern:
-                import re
-
                 if not re.search(pattern, name):
                     continue
 
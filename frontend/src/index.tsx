@@ -7,6 +7,8 @@
  * State is synchronized with Python through:
  * - useModelState: For reactive state (chat_history, action_buttons)
  * - useModel: For sending messages back to Python
+ * - Custom messages: Incremental updates (chat_append, code_append) applied to local state
+ * - Custom messages: Streamed AI text (chat_stream_start/delta/end) shown until the final message arrives
  */
 
 import React, { useState, useEffect, useRef, useMemo } from "react";
@@ -79,6 +81,9 @@ const styles = `
 
 type ActionButton = string | { text: string; color?: string; icon?: string };
 
+// Must match MAX_CODE_HISTORY in agent_widget.py
+const MAX_CODE_HISTORY = 50;
+
 type CodeHistoryItem = {
   code: string;
   execution_count: number;
@@ -95,13 +100,20 @@ export function ChatWidget() {
   const [isLoading] = useModelState<boolean>("is_loading");
   const [activeTab, setActiveTab] = useState<"chat" | "code">("chat");
   const model = useModel();
+  const [streaming, setStreaming] = useState<{ id: string; content: string } | null>(null);
   const [copiedIndex, setCopiedIndex] = useState<number | null>(null);
   const [copiedCodeIndex, setCopiedCodeIndex] = useState<number | null>(null);
   const messagesEndRef = useRef<null | HTMLDivElement>(null);
   const textareaRef = useRef<null | HTMLTextAreaElement>(null);
 
-  // Always use synchronized chat history as the source of truth
-  const messages = useMemo(() => (Array.isArray(chatHistory) ? chatHistory : []), [chatHistory]);
+  // Always use synchronized chat history as the source of truth, followed by
+  // the AI response that is still being streamed (if any)
+  const messages = useMemo(() => {
+    const history = Array.isArray(chatHistory) ? chatHistory : [];
+    return streaming?.content
+      ? [...history, { role: "assistant", content: streaming.content }]
+      : history;
+  }, [chatHistory, streaming]);
   const codeItems = useMemo(
     () => (Array.isArray(codeHistory) ? (codeHistory as CodeHistoryItem[]) : []),
     [codeHistory]
@@ -125,6 +137,32 @@ export function ChatWidget() {
     }
   };
 
+  // Python sends new chat/code entries as deltas instead of re-syncing the full
+  // history; apply them locally (without save_changes) so views update.
+  useEffect(() => {
+    if (!model) return;
+    const handleCustomMessage = (msg: any) => {
+      if (msg?.type === "chat_append") {
+        const history = model.get("chat_history");
+        model.set("chat_history", [...(Array.isArray(history) ? history : []), msg.message]);
+      } else if (msg?.type === "code_append") {
+        const history = model.get("code_history");
+        const items = Array.isArray(history) ? history : [];
+        model.set("code_history", [...items, msg.entry].slice(-MAX_CODE_HISTORY));
+      } else if (msg?.type === "chat_stream_start") {
+        setStreaming({ id: msg.id, content: "" });
+      } else if (msg?.type === "chat_stream_delta") {
+        setStreaming(current =>
+          current?.id === msg.id ? { ...current, content: current.content + msg.delta } : current
+        );
+      } else if (msg?.type === "chat_stream_end") {
+        setStreaming(current => (current?.id === msg.id ? null : current));
+      }
+    };
+    model.on("msg:custom", handleCustomMessage);
+    return () => model.off("msg:custom", handleCustomMessage);
+  }, [model]);
+
   // Model changes are handled automatically by useModelState
 
   const handleSubmit = (e: React.FormEvent) => {
@@ -134,9 +172,6 @@ export function ChatWidget() {
     // Send message to Python using the proper model hook
     if (model) {
       model.send({ type: "user_message", text: input });
-
-      // Force a save to ensure sync
-      model.save_changes();
     }
 
     setInput("");
@@ -157,7 +192,6 @@ export function ChatWidget() {
   const handleActionButton = (buttonText: string) => {
     if (model) {
       model.send({ type: "action_button", action: buttonText });
-      model.save_changes();
     }
   };
 
@@ -371,7 +405,7 @@ export function ChatWidget() {
                   </div>
                 ))
               )}
-              {isLoading && (
+              {isLoading && !streaming?.content && (
                 <div
                   className="message-enter"
                   style={{
@@ -1,10 +1,28 @@
 """Pytest configuration and fixtures for widget tests."""
 
 from collections.abc import Callable
+from pathlib import Path
 
 import pytest
 
 from assistant_ui_anywidget.agent_widget import AgentWidget
+from assistant_ui_anywidget.ai.langgraph_service import cached_init_chat_model
+
+
+@pytest.fixture(autouse=True)  # type: ignore[misc]
+def clear_chat_model_cache() -> None:
+    """Don't share chat models (or their mocks) between tests."""
+    cached_init_chat_model.cache_clear()
+
+
+@pytest.fixture(autouse=True)  # type: ignore[misc]
+def conversation_log_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Write conversation logs to a temporary directory, not the repo root."""
+    log_dir = tmp_path / "ai_conversation_logs"
+    monkeypatch.setattr(
+        "assistant_ui_anywidget.ai.logger.DEFAULT_LOG_DIR", str(log_dir)
+    )
+    return log_dir
 
 
 @pytest.fixture  # type: ignore[misc]
@@ -1,10 +1,16 @@
 """Regression tests for AI service issues."""
 
 import os
+from pathlib import Path
 from typing import Any
 from unittest.mock import MagicMock, patch
 
+import pytest
+from langchain_core.globals import get_llm_cache
+from langchain_core.language_models import FakeListChatModel
+
 from assistant_ui_anywidget.ai import AIService
+from assistant_ui_anywidget.ai.langgraph_service import init_llm
 from assistant_ui_anywidget.kernel_interface import KernelInterface
 
 
@@ -192,3 +198,67 @@ class TestAIServiceRegression:
             assert hasattr(result, "success")
             assert result.success is True
             assert result.content  # Should have some response content
+
+    def test_services_share_chat_model(self) -> None:
+        """Test that services with the same model reuse one chat model."""
+        mock_kernel = MagicMock(spec=KernelInterface)
+        mock_kernel.is_available = True
+
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}, clear=True):
+            with patch(
+                "assistant_ui_anywidget.ai.langgraph_service.init_chat_model"
+            ) as mock_init:
+                mock_init.return_value = MagicMock()
+
+                first = AIService(kernel=mock_kernel)
+                second = AIService(kernel=mock_kernel)
+
+                mock_init.assert_called_once()
+                assert first.llm is second.llm
+
+    def test_unhashable_kwargs_skip_model_cache(self) -> None:
+        """Test that unhashable model kwargs create a model instead of failing."""
+        mock_kernel = MagicMock(spec=KernelInterface)
+        mock_kernel.is_available = True
+
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}, clear=True):
+            with patch(
+                "assistant_ui_anywidget.ai.langgraph_service.init_chat_model"
+            ) as mock_init:
+                mock_init.return_value = MagicMock()
+
+                service = AIService(kernel=mock_kernel, stop=["\n\n"])
+
+                mock_init.assert_called_once()
+                assert service.llm is mock_init.return_value
+
+    @pytest.mark.parametrize(  # type: ignore[misc]
+        ("temperature", "expected"),
+        [
+            (0.7, ["first", "second"]),
+            (0, ["first", "first"]),
+            (None, ["first", "first"]),
+        ],
+    )
+    def test_llm_cache_skipped_for_sampled_responses(
+        self, tmp_path: Path, temperature: Any, expected: list[str]
+    ) -> None:
+        """Test that the opt-in SQLite LLM cache only serves deterministic calls."""
+
+        def fake_init_chat_model(**kwargs: Any) -> FakeListChatModel:
+            return FakeListChatModel(
+                responses=["first", "second"], cache=kwargs.get("cache")
+            )
+
+        cache_path = str(tmp_path / "llm_cache.db")
+        with patch.dict(os.environ, {"ASSISTANT_UI_LLM_CACHE": cache_path}):
+            with patch(
+                "assistant_ui_anywidget.ai.langgraph_service.init_chat_model",
+                side_effect=fake_init_chat_model,
+            ):
+                llm = init_llm("fake-model", "openai", temperature=temperature)
+        responses = [llm.invoke("hi").content for _ in range(2)]
+
+        assert responses == expected
+        # The cache is passed to this model only, not installed globally
+        assert get_llm_cache() is None
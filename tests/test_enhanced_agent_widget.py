@@ -1,12 +1,15 @@
 """Tests for AgentWidget with enhanced features."""
 # mypy: disable-error-code=misc
 
+import asyncio
 from typing import Any
 from unittest.mock import Mock, patch
 
 import pytest
 
 from assistant_ui_anywidget import AgentWidget
+from assistant_ui_anywidget.agent_widget import MAX_CODE_HISTORY
+from assistant_ui_anywidget.ai import ChatResult
 from assistant_ui_anywidget.kernel_interface import (
     VariableInfo,
     ExecutionResult,
@@ -22,8 +25,13 @@ class MockKernel:
         self.is_available = True
         self.namespace = {"x": 42, "y": "hello", "df": Mock()}
         self.execution_count = 0
+        self._executions = 0
         self._execution_callback = None
 
+    @property
+    def state_version(self) -> tuple[int, int]:
+        return (self.execution_count, self._executions)
+
     def get_namespace(self) -> dict[str, Any]:
         if not self.is_available:
             return {}
@@ -67,7 +75,10 @@ class MockKernel:
     def execute_code(
         self, code: str, silent: bool = False, store_history: bool = True
     ) -> ExecutionResult:
-        self.execution_count += 1
+        # Like IPython, silent runs don't bump the execution count
+        self._executions += 1
+        if store_history and not silent:
+            self.execution_count += 1
 
         if code == "1 + 1":
             result = ExecutionResult(
@@ -110,7 +121,7 @@ class MockKernel:
             )
 
         # Call the callback if set (to simulate real behavior)
-        if self._execution_callback:
+        if self._execution_callback and not silent:
             self._execution_callback(code, result)  # type: ignore[unreachable]
 
         return result
@@ -250,6 +261,77 @@ class TestAgentWidget:
         assert len(widget.chat_history) == 2
         assert "Available Commands" in widget.chat_history[1]["content"]
 
+    def test_handle_user_message_async(self, widget: AgentWidget) -> None:
+        """Test the non-blocking user message path used inside the kernel."""
+        asyncio.run(widget._handle_user_message_async("Hello"))
+        assert len(widget.chat_history) == 2
+        assert widget.chat_history[0]["content"] == "Hello"
+        assert "mock AI assistant" in widget.chat_history[1]["content"]
+        assert widget.is_loading is False
+
+    def test_handle_user_message_async_streams(self, widget: AgentWidget) -> None:
+        """Test that the async path streams the response before appending it."""
+        widget.send = Mock()
+        asyncio.run(widget._handle_user_message_async("Hello"))
+
+        types = [call.args[0]["type"] for call in widget.send.call_args_list]
+        assert types[1] == "chat_stream_start"
+        assert "chat_stream_delta" in types
+        assert "chat_stream_end" in types
+        assert types[-1] == "chat_append"
+
+    def test_overlapping_messages_run_one_at_a_time(self, widget: AgentWidget) -> None:
+        """Test that a second message waits until the first one is answered."""
+        assert widget.ai_service is not None
+        achat = widget.ai_service.achat
+        running = []
+
+        async def slow_achat(**kwargs: Any) -> ChatResult:
+            running.append(kwargs["message"])
+            assert len(running) == 1
+            await asyncio.sleep(0.01)
+            result = await achat(**kwargs)
+            running.remove(kwargs["message"])
+            return result
+
+        async def send_both() -> None:
+            await asyncio.gather(
+                widget._handle_user_message_async("First"),
+                widget._handle_user_message_async("Second"),
+            )
+
+        with patch.object(widget.ai_service, "achat", slow_achat):
+            loading = []
+            widget.observe(lambda change: loading.append(change["new"]), "is_loading")
+            asyncio.run(send_both())
+
+        roles = [m["role"] for m in widget.chat_history]
+        assert roles == ["user", "user", "assistant", "assistant"]
+        # Stays loading until the second reply arrives
+        assert loading == [True, False]
+
+    def test_handle_approval_async_without_pending_request(
+        self, widget: AgentWidget
+    ) -> None:
+        """Test that the async approval path reports a missing approval request."""
+        asyncio.run(widget._handle_approval_async(True))
+        assert "No pending approval request" in widget.chat_history[-1]["content"]
+        assert widget.is_loading is False
+
+    def test_approval_answers_pending_thread_once(self, widget: AgentWidget) -> None:
+        """Test that an approval resumes the pending thread and consumes it."""
+        widget._finish_user_message(
+            ChatResult(
+                content="",
+                thread_id="pending-thread",
+                interrupted=True,
+                interrupt_message="Execute code?",
+            )
+        )
+        assert widget._start_approval() == "pending-thread"
+        assert widget._start_approval() is None
+        assert "No pending approval request" in widget.chat_history[-1]["content"]
+
     def test_command_vars(self, widget: AgentWidget) -> None:
         """Test /vars command."""
         response = widget._cmd_show_variables()
@@ -361,9 +443,73 @@ class TestAgentWidget:
         assert "response" in call_args
         assert call_args["response"]["success"] is True
 
+    def test_add_message_sends_delta(self, widget: AgentWidget) -> None:
+        """Test that new chat messages are sent as deltas, not full history."""
+        widget.add_message("user", "First")
+        widget.send = Mock()
+
+        widget.add_message("assistant", "Second")
+
+        widget.send.assert_called_once_with(
+            {
+                "type": "chat_append",
+                "message": {"role": "assistant", "content": "Second"},
+            }
+        )
+        assert [m["content"] for m in widget.chat_history] == ["First", "Second"]
+
+    def test_code_history_is_bounded(self, widget: AgentWidget) -> None:
+        """Test that code history keeps the latest entries and sends deltas."""
+        for i in range(MAX_CODE_HISTORY + 5):
+            widget.add_code_to_history(code=f"x = {i}", execution_count=i)
+
+        assert len(widget.code_history) == MAX_CODE_HISTORY
+        assert widget.code_history[0]["code"] == "x = 5"
+
+        widget.send = Mock()
+        widget.add_code_to_history(code="y = 1", execution_count=99)
+        sent = widget.send.call_args[0][0]
+        assert sent["type"] == "code_append"
+        assert sent["entry"]["code"] == "y = 1"
+        assert widget.code_history[-1]["code"] == "y = 1"
+
+    def test_kernel_context_cached_until_execution(self, widget: AgentWidget) -> None:
+        """Test that the AI context is reused until code is executed."""
+        context = widget._get_kernel_context()
+        assert widget._get_kernel_context() is context
+
+        widget.kernel.execute_code("z = 1")
+        assert widget._get_kernel_context() is not context
+
+    def test_kernel_context_rebuilt_after_silent_execution(
+        self, widget: AgentWidget
+    ) -> None:
+        """Test that code the agent runs silently invalidates the AI context."""
+        context = widget._get_kernel_context()
+        widget.kernel.execute_code("z = 1", silent=True)
+        assert widget._get_kernel_context() is not context
+
+    def test_variable_info_refetched_after_silent_execution(
+        self, widget: AgentWidget
+    ) -> None:
+        """Test that cached VariableInfo is dropped when code runs silently."""
+        assert widget._get_variable_info("x") is widget._get_variable_info("x")
+
+        widget.kernel.namespace["x"] = 2  # type: ignore[attr-defined]
+        widget.kernel.execute_code("x = 2", silent=True)
+        var_info = widget._get_variable_info("x")
+        assert var_info is not None
+        assert var_info.preview == "2"
+
+    def test_variable_info_shared_with_context(self, widget: AgentWidget) -> None:
+        """Test that the AI context reuses VariableInfo from the variables view."""
+        widget.kernel.get_variable_info = Mock(return_value=None)  # type: ignore[method-assign]
+        widget._get_kernel_context()
+        widget.kernel.get_variable_info.assert_not_called()
+
     def test_update_kernel_state(self, widget: AgentWidget) -> None:
         """Test kernel state updates."""
-        widget._update_kernel_state()
+        widget._refresh_kernel_views()
 
         assert widget.kernel_state["available"] is True
         assert widget.kernel_state["status"] == "idle"
@@ -372,13 +518,13 @@ class TestAgentWidget:
 
         # Test without kernel
         widget.kernel.is_available = False
-        widget._update_kernel_state()
+        widget._refresh_kernel_views()
         assert widget.kernel_state["available"] is False
         assert widget.kernel_state["status"] == "not_connected"  # type: ignore[unreachable]
 
     def test_update_variables_info(self, widget: AgentWidget) -> None:
         """Test variables info updates."""
-        widget._update_variables_info()
+        widget._refresh_kernel_views()
 
         assert len(widget.variables_info) == 3
         var_names = [v["name"] for v in widget.variables_info]
@@ -388,9 +534,32 @@ class TestAgentWidget:
 
         # Test without kernel
         widget.kernel.is_available = False
-        widget._update_variables_info()
+        widget._refresh_kernel_views()
         assert widget.variables_info == []
 
+    def test_refresh_skipped_when_kernel_unchanged(self, widget: AgentWidget) -> None:
+        """Test that kernel views are only rebuilt after the kernel changes."""
+        widget.kernel.get_variable_info = Mock(return_value=None)  # type: ignore[method-assign]
+        widget.kernel.get_namespace = Mock(wraps=widget.kernel.get_namespace)  # type: ignore[method-assign]
+        widget.kernel.get_kernel_info = Mock(wraps=widget.kernel.get_kernel_info)  # type: ignore[method-assign]
+        widget._refresh_kernel_views()
+        widget.kernel.get_variable_info.assert_not_called()
+        widget.kernel.get_namespace.assert_not_called()
+        widget.kernel.get_kernel_info.assert_not_called()
+
+        widget.kernel.execute_code("z = 1")
+        widget._refresh_kernel_views()
+        assert widget.kernel.get_variable_info.call_count == 3
+
+    def test_refresh_after_silent_execution(self, widget: AgentWidget) -> None:
+        """Test that kernel views are rebuilt after code runs silently."""
+        widget.kernel.namespace["x"] = 2  # type: ignore[attr-defined]
+        widget.kernel.execute_code("x = 2", silent=True)
+        widget._refresh_kernel_views()
+
+        x_info = next(v for v in widget.variables_info if v["name"] == "x")
+        assert x_info["preview"] == "2"
+
     def test_programmatic_methods(self, widget: AgentWidget) -> None:
         """Test programmatic API methods."""
         # Test add_message
@@ -426,6 +595,12 @@ class TestAgentWidget:
         widget.clear_action_buttons()
         assert len(widget.action_buttons) == 0
 
+    def test_command_args_after_newline(self, widget: AgentWidget) -> None:
+        """Test that command arguments may start on the next line."""
+        response = widget._handle_command("/exec\n1 + 1")
+        assert "Success" in response
+        assert "2" in response
+
     def test_handle_unknown_command(self, widget: AgentWidget) -> None:
         """Test handling unknown commands."""
         response = widget._handle_command("/unknown")
@@ -435,11 +610,12 @@ class TestAgentWidget:
     def test_empty_namespace(self, widget: AgentWidget) -> None:
         """Test behavior with empty namespace."""
         widget.kernel.namespace = {}  # type: ignore[attr-defined]
+        widget.kernel.execution_count += 1  # type: ignore[attr-defined]
 
         response = widget._cmd_show_variables()
         assert "No variables" in response
 
-        widget._update_variables_info()
+        widget._refresh_kernel_views()
         assert widget.variables_info == []
 
     def test_kernel_not_available(self, widget: AgentWidget) -> None:
@@ -452,5 +628,5 @@ class TestAgentWidget:
         widget._handle_user_message("/vars")
         assert "No variables in namespace" in widget.chat_history[-1]["content"]
 
-        widget._update_kernel_state()
+        widget._refresh_kernel_views()
         assert widget.kernel_state["status"] == "not_connected"
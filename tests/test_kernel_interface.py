@@ -1,5 +1,7 @@
 """Tests for kernel interface functionality."""
 
+import asyncio
+import time
 from unittest.mock import Mock, patch
 
 import pytest
@@ -10,6 +12,7 @@ from assistant_ui_anywidget.kernel_interface import (
     StackFrame,
     VariableInfo,
 )
+from assistant_ui_anywidget.kernel_tools import ExecuteCodeTool
 
 
 class MockIPython:
@@ -195,6 +198,22 @@ class TestKernelInterface:
         assert "new_var" in result.variables_changed
         assert result.outputs == []  # No output for assignment
 
+    def test_state_version_changes_on_execution(
+        self, kernel_interface: KernelInterface, mock_ipython: MockIPython
+    ) -> None:
+        """Test that state_version tracks notebook cells and silent execution."""
+        version = kernel_interface.state_version
+        assert kernel_interface.state_version == version
+
+        # A cell run directly in the notebook
+        mock_ipython.execution_count += 1
+        assert kernel_interface.state_version != version
+
+        # Silent execution doesn't bump the shell's count in real IPython
+        version = kernel_interface.state_version
+        kernel_interface.execute_code("x = 1", silent=True)
+        assert kernel_interface.state_version != version
+
     def test_execute_code_error(self, kernel_interface: KernelInterface) -> None:
         """Test code execution with error."""
         result = kernel_interface.execute_code("raise ValueError('test error')")
@@ -204,6 +223,45 @@ class TestKernelInterface:
         assert result.error["message"] == "test error"
         assert len(result.error["traceback"]) > 0
 
+    def test_concurrent_executions_keep_their_output(
+        self,
+        kernel_interface: KernelInterface,
+        mock_ipython: MockIPython,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """Test that agent executions and a concurrent cell don't share output."""
+
+        def run_cell(
+            code: str, silent: bool = False, store_history: bool = True
+        ) -> Mock:
+            time.sleep(0.05)  # Give the concurrent cell a chance to print
+            print(f"output of {code}")
+            return Mock(result=None, error_in_exec=None)
+
+        mock_ipython.run_cell = run_cell  # type: ignore[method-assign]
+        tool = ExecuteCodeTool(kernel_interface)
+
+        async def notebook_cell() -> None:
+            await asyncio.sleep(0.01)
+            print("output of cell")
+
+        async def run_all() -> list[str]:
+            first, second, _ = await asyncio.gather(
+                tool.ainvoke({"code": "a = 1"}),
+                tool.ainvoke({"code": "b = 2"}),
+                notebook_cell(),
+            )
+            return [first, second]
+
+        first, second = asyncio.run(run_all())
+
+        assert "output of a = 1" in first
+        assert "output of b = 2" not in first
+        assert "output of b = 2" in second
+        assert "output of a = 1" not in second
+        assert "output of cell" not in first + second
+        assert "output of cell" in capsys.readouterr().out
+
     def test_get_last_error(self, kernel_interface: KernelInterface) -> None:
         """Test getting last error information."""
         # Initially no error
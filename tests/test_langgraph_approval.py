@@ -1,11 +1,59 @@
 """Tests for LangGraph approval workflow."""
 
+import asyncio
 import os
+from typing import Any, List, Optional
 from unittest.mock import MagicMock, patch
 
+from langchain_core import outputs
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
 
-from assistant_ui_anywidget.ai.langgraph_service import LangGraphAIService, ChatResult
-from assistant_ui_anywidget.kernel_interface import KernelInterface
+from assistant_ui_anywidget.ai.langgraph_service import (
+    ChatResult,
+    LangGraphAIService,
+    approval_node,
+    get_chunk_text,
+    get_message_text,
+    trim_history,
+)
+from assistant_ui_anywidget.ai.mock import MockLLM
+from assistant_ui_anywidget.kernel_interface import (
+    ExecutionResult,
+    KernelContext,
+    KernelInterface,
+)
+
+
+class CodeRunningLLM(MockLLM):
+    """Mock LLM that asks to run code, then reports the outcome."""
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> outputs.ChatResult:
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            message = AIMessage(content=f"Result: {last.content}")
+        elif last.content == "Operation denied by user.":
+            message = AIMessage(content="Okay, I won't run it.")
+        else:
+            message = AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": "execute_code", "args": {"code": "x = 42"}, "id": "call-1"}
+                ],
+            )
+        return outputs.ChatResult(generations=[outputs.ChatGeneration(message=message)])
 
 
 class TestLangGraphApproval:
@@ -107,3 +155,229 @@ class TestLangGraphApproval:
 
         assert simple_widget.ai_service is not None
         assert isinstance(simple_widget.ai_service, LangGraphAIService)
+
+    def test_achat_with_mock_llm(self) -> None:
+        """Test that the async chat path returns the same kind of result as chat."""
+        mock_kernel = MagicMock(spec=KernelInterface)
+        mock_kernel.is_available = True
+
+        with patch.dict(os.environ, {}, clear=True):
+            service = LangGraphAIService(kernel=mock_kernel, require_approval=False)
+
+            result = asyncio.run(service.achat("hi", thread_id="async-thread"))
+
+            assert result.success
+            assert result.thread_id == "async-thread"
+            assert "mock AI assistant" in result.content
+
+    def test_abatch_chat_runs_each_thread(self) -> None:
+        """Test that abatch_chat returns one result per request, in order."""
+        mock_kernel = MagicMock(spec=KernelInterface)
+        mock_kernel.is_available = True
+
+        with patch.dict(os.environ, {}, clear=True):
+            service = LangGraphAIService(kernel=mock_kernel, require_approval=False)
+
+            results = asyncio.run(
+                service.abatch_chat(
+                    [("thread-a", "hi", None), ("thread-b", "hello", None)]
+                )
+            )
+
+            assert [r.thread_id for r in results] == ["thread-a", "thread-b"]
+            assert all(r.success for r in results)
+
+    def test_achat_streams_tokens(self) -> None:
+        """Test that achat passes the AI text to on_token as it is generated."""
+        mock_kernel = MagicMock(spec=KernelInterface)
+        mock_kernel.is_available = True
+        tokens: list[str] = []
+
+        with patch.dict(os.environ, {}, clear=True):
+            service = LangGraphAIService(kernel=mock_kernel, require_approval=False)
+
+            result = asyncio.run(
+                service.achat("hi", thread_id="stream-thread", on_token=tokens.append)
+            )
+
+            assert result.success
+            assert "".join(tokens) == result.content
+
+    def _stream_approval(
+        self, decision: str | bool
+    ) -> tuple[ChatResult, ChatResult, MagicMock, list[str]]:
+        """Stream a code-running turn, then resume it with ``decision``."""
+        mock_kernel = MagicMock(spec=KernelInterface)
+        mock_kernel.is_available = True
+        mock_kernel.execute_code.return_value = ExecutionResult(
+            success=True,
+            execution_count=1,
+            outputs=[],
+            execution_time=0.0,
+            variables_changed=["x"],
+        )
+        tokens: list[str] = []
+
+        async def run() -> tuple[ChatResult, ChatResult]:
+            first = await service.achat(
+                "set x", thread_id="approval-thread", on_token=tokens.append
+            )
+            resumed = await service.achat(
+                decision, thread_id="approval-thread", on_token=tokens.append
+            )
+            return first, resumed
+
+        with patch(
+            "assistant_ui_anywidget.ai.langgraph_service.init_llm",
+            return_value=CodeRunningLLM(),
+        ):
+            service = LangGraphAIService(kernel=mock_kernel, require_approval=True)
+        first, resumed = asyncio.run(run())
+        return first, resumed, mock_kernel, tokens
+
+    def test_streamed_approval_runs_code(self) -> None:
+        """Test that approving a streamed turn executes the code and finishes."""
+        first, resumed, mock_kernel, tokens = self._stream_approval("Approve")
+
+        assert first.needs_approval
+        assert "x = 42" in (first.interrupt_message or "")
+        assert resumed.success and not resumed.needs_approval
+        mock_kernel.execute_code.assert_called_once_with("x = 42", silent=False)
+        assert "Variables changed: x" in resumed.content
+        assert "".join(tokens) == resumed.content
+
+    def test_streamed_denial_skips_code(self) -> None:
+        """Test that denying a streamed turn skips the code and finishes."""
+        first, resumed, mock_kernel, tokens = self._stream_approval(False)
+
+        assert first.needs_approval
+        assert resumed.success and not resumed.needs_approval
+        mock_kernel.execute_code.assert_not_called()
+        assert resumed.content == "Okay, I won't run it."
+        assert "".join(tokens) == resumed.content
+
+    def test_approval_node_without_operations(self) -> None:
+        """Test that the approval node doesn't interrupt when nothing needs approval."""
+        message = AIMessage(
+            content="",
+            tool_calls=[{"name": "get_variables", "args": {}, "id": "call-1"}],
+        )
+
+        result = approval_node({"messages": [message]})
+
+        assert result.goto == "tools"
+        assert result.update == {"pending_approval": False, "approval_granted": True}
+
+    def test_get_chunk_text(self) -> None:
+        """Test that only text is streamed from string and block content."""
+        assert get_chunk_text("Hello") == "Hello"
+        assert (
+            get_chunk_text(
+                [
+                    {"type": "text", "text": "Hel", "index": 0},
+                    {"type": "tool_use", "partial_json": '{"code": ', "index": 1},
+                    "lo",
+                ]
+            )
+            == "Hello"
+        )
+
+    def test_get_message_text(self) -> None:
+        """Test that message content is returned as a string for any message."""
+        assert get_message_text(AIMessage(content="Done")) == "Done"
+        assert get_message_text(AIMessage(content=["a", "b"])) == "a\nb"
+        assert get_message_text(HumanMessage(content="Denied")) == "Denied"
+
+    def test_system_message_replaced_each_turn(self) -> None:
+        """Test that the conversation keeps a single, up to date system message."""
+        mock_kernel = MagicMock(spec=KernelInterface)
+        mock_kernel.is_available = True
+
+        with patch.dict(os.environ, {}, clear=True):
+            service = LangGraphAIService(kernel=mock_kernel, require_approval=False)
+            service.chat("hi", thread_id="system-thread")
+            service.chat("hello again", thread_id="system-thread")
+
+            config = {"configurable": {"thread_id": "system-thread"}}
+            messages = service.agent.get_state(config).values["messages"]
+            system_messages = [m for m in messages if m.type == "system"]
+            assert len(system_messages) == 1
+            assert messages[0] is system_messages[0]
+            assert len(messages) == 5  # system + 2 x (human, ai)
+
+    def test_context_system_message_reused(self) -> None:
+        """Test that the system message is only rebuilt for a new kernel context."""
+        mock_kernel = MagicMock(spec=KernelInterface)
+        mock_kernel.is_available = True
+
+        with patch.dict(os.environ, {}, clear=True):
+            service = LangGraphAIService(kernel=mock_kernel, require_approval=False)
+        context = KernelContext(kernel_info={"namespace_size": 1}, variables=[])
+
+        first = service._build_payload("hi", "t", context)["messages"][0]
+        second = service._build_payload("again", "t", context)["messages"][0]
+        new_context = KernelContext(kernel_info={"namespace_size": 2}, variables=[])
+        third = service._build_payload("more", "t", new_context)["messages"][0]
+
+        assert first is second
+        assert third is not first
+        assert "2 variables" in third.content
+
+    def test_anthropic_system_prompt_cached(self) -> None:
+        """Test that the static prompt is marked cacheable for Anthropic models."""
+        mock_kernel = MagicMock(spec=KernelInterface)
+        mock_kernel.is_available = True
+        mock_llm = MagicMock()
+        mock_llm._llm_type = "anthropic-chat"
+
+        with patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test-key"}, clear=True):
+            with patch(
+                "assistant_ui_anywidget.ai.langgraph_service.init_chat_model",
+                return_value=mock_llm,
+            ):
+                service = LangGraphAIService(kernel=mock_kernel)
+        context = KernelContext(kernel_info={"namespace_size": 1}, variables=[])
+
+        system_message = service._build_payload("hi", "t", context)["messages"][0]
+        prompt, kernel_state = system_message.content
+        assert prompt["text"] == service.system_prompt
+        assert prompt["cache_control"] == {"type": "ephemeral"}
+        assert "1 variables" in kernel_state["text"]
+
+    def test_trim_history_keeps_system_and_recent_turns(self) -> None:
+        """Test that old turns are dropped once the history exceeds the budget."""
+        messages = [
+            SystemMessage(content="system"),
+            HumanMessage(content="a" * 4000),
+            AIMessage(content="b" * 4000),
+            HumanMessage(content="latest"),
+        ]
+        with patch(
+            "assistant_ui_anywidget.ai.langgraph_service.MAX_HISTORY_TOKENS", 1500
+        ):
+            trimmed = trim_history(messages)  # type: ignore[arg-type]
+
+        assert [m.content for m in trimmed] == ["system", "latest"]
+        assert trim_history(messages, max_tokens=1500) == trimmed  # type: ignore[arg-type]
+        assert trim_history(messages) == messages  # type: ignore[arg-type]
+
+    def test_trim_history_drops_old_turns_when_current_turn_too_long(self) -> None:
+        """Test that earlier turns are dropped even if the current one doesn't fit."""
+        old_turns = [
+            message
+            for i in range(100)
+            for message in (HumanMessage(content=f"q{i}"), AIMessage(content=f"a{i}"))
+        ]
+        current_turn = [
+            HumanMessage(content="latest"),
+            AIMessage(
+                content="",
+                tool_calls=[{"name": "get_variables", "args": {}, "id": "call-1"}],
+            ),
+            ToolMessage(content="x" * 10_000, tool_call_id="call-1"),
+        ]
+        messages = [SystemMessage(content="system"), *old_turns, *current_turn]
+
+        trimmed = trim_history(messages, max_tokens=1500)  # type: ignore[arg-type]
+
+        assert trimmed == [messages[0], *current_turn]
@@ -3,7 +3,11 @@
 from unittest.mock import patch, MagicMock
 
 from assistant_ui_anywidget.ai.prompt_config import SystemPromptConfig
-from assistant_ui_anywidget.ai.langgraph_service import LangGraphAIService
+from assistant_ui_anywidget.ai.langgraph_service import (
+    LangGraphAIService,
+    get_system_prompt,
+    load_system_prompt,
+)
 from assistant_ui_anywidget.kernel_interface import KernelInterface
 
 
@@ -94,3 +98,16 @@ class TestPromptConfigRegression:
             assert system_msg.content
             assert "EXTREMELY PROACTIVE" in system_msg.content
             assert "TOOL USAGE - BE EXTREMELY EAGER!" in system_msg.content
+
+    def test_system_prompt_loaded_once(self) -> None:
+        """Test that the YAML file is only parsed again after it changes."""
+        load_system_prompt.cache_clear()
+        with patch(
+            "assistant_ui_anywidget.ai.langgraph_service.SystemPromptConfig",
+            wraps=SystemPromptConfig,
+        ) as mock_config:
+            first = get_system_prompt(require_approval=True)
+            second = get_system_prompt(require_approval=True)
+
+            assert first == second
+            mock_config.assert_called_once()